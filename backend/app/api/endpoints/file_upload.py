@@ -58,6 +58,23 @@ async def calculate_partition_distance(partition_input: bipartite_schema.SystemP
         merged_matrix=partition_input.merged_matrix,
         complete_position=partition_input.complete_position,
         candidate=partition_input.candidate,
+        workers=partition_input.workers,
+        time_budget_secs=partition_input.time_budget_secs,
+        max_evaluations=partition_input.max_evaluations,
+    )
+
+# Calculate minimum partition of several states of the same system at once
+@router.post("/bipartite/minimum-partition/e1/batch")
+async def calculate_partition_distances(partition_input: bipartite_schema.SystemPartitionBatchInput, db: Session = Depends(get_db)):
+    return process_controller.calculate_partition_distances(
+        db=db,
+        full_system=partition_input.full_system,
+        states=partition_input.states,
+        subsystem=partition_input.subsystem,
+        merged_matrix=partition_input.merged_matrix,
+        complete_position=partition_input.complete_position,
+        time_budget_secs=partition_input.time_budget_secs,
+        max_evaluations=partition_input.max_evaluations,
     )
 
 # Calculate minimum partition using edge removal with local search
@@ -71,6 +88,9 @@ async def calculate_partition_distance_v2(partition_input: bipartite_schema.Syst
         merged_matrix=partition_input.merged_matrix,
         complete_position=partition_input.complete_position,
         candidate=partition_input.candidate,
+        time_budget_secs=partition_input.time_budget_secs,
+        max_evaluations=partition_input.max_evaluations,
+        cut_method=partition_input.cut_method,
     )
 
 # Calculate minimum partition using algorithm inspired in Ant Colony Optimization (ACO)
@@ -84,4 +104,11 @@ async def calculate_partition_distance_v3(partition_input: bipartite_schema.Syst
         merged_matrix=partition_input.merged_matrix,
         complete_position=partition_input.complete_position,
         candidate=partition_input.candidate,
+        time_budget_secs=partition_input.time_budget_secs,
+        max_evaluations=partition_input.max_evaluations,
+        seed=partition_input.seed,
+        workers=partition_input.workers,
+        stagnation_iterations=partition_input.stagnation_iterations,
+        entropy_threshold=partition_input.entropy_threshold,
+        warm_start=partition_input.warm_start,
     )
\ No newline at end of file
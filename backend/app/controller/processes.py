@@ -8,10 +8,13 @@ import math
 from app.schemas.graphs import GraphSchema
 from ..models import graph as graph_model
 from ..services.matching import CheckBipartite, NotBipartiteException, BipartiteMatchResponse
-from ..services.compare_partitions import calculate_minimum_partition
+from ..services.compare_partitions import calculate_minimum_partition, calculate_minimum_partitions
 from ..services.edges_cut_removal import calculate_edges_cut
 from ..services.aco import run_aco
 from ..services.matrix import get_subsystem_distribution, recursive_marginalization
+from ..services.marginalization_cache import marginalization_cache
+from ..services.search_budget import SearchBudget
+from ..services.bit_index import index_to_binary
 
 def check_bipartiteness(db: Session, graph_name: str) -> BipartiteMatchResponse:
     graph = db.query(graph_model.Graph).filter(graph_model.Graph.name == graph_name).first()
@@ -67,8 +70,9 @@ def complete_matrix(full_matrix: np.ndarray, position: int):
 
   return new_full_matrix
 
-def calculate_partition_distance(db: Session, full_system, binary_distribution, subsystem, merged_matrix, complete_position=None, candidate=None) -> float:
+def calculate_partition_distance(db: Session, full_system, binary_distribution, subsystem, merged_matrix, complete_position=None, candidate=None, workers=None, time_budget_secs=None, max_evaluations=None) -> float:
     start_date = datetime.datetime.now()
+    budget = SearchBudget(time_budget_secs=time_budget_secs, max_evaluations=max_evaluations)
     full_system = np.array(full_system)
 
     if complete_position is not None:
@@ -82,20 +86,67 @@ def calculate_partition_distance(db: Session, full_system, binary_distribution,
         full_system = unmerge_matrix(full_system)
 
     if subsystem is not None:
-        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]))
+        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]), cache=marginalization_cache)
         binary_distribution = "".join([binary_distribution[i] for i in subsystem[1]])
 
     res = calculate_minimum_partition(
         full_system=full_system,
         binary_distribution=binary_distribution,
+        workers=workers,
+        budget=budget,
     )
 
     res.stats["elapsed_time_secs"] = (datetime.datetime.now() - start_date).total_seconds()
 
     return res
 
-def calculate_edges_cut_distance(db: Session, full_system, binary_distribution, subsystem, merged_matrix, complete_position=None, candidate=None) -> float:
+def calculate_partition_distances(db: Session, full_system, states, subsystem, merged_matrix, complete_position=None, time_budget_secs=None, max_evaluations=None) -> list:
+    """
+    @states: binary distributions of the full system, or "all" for every state of the (sub)system
+    """
     start_date = datetime.datetime.now()
+    budget = SearchBudget(time_budget_secs=time_budget_secs, max_evaluations=max_evaluations)
+    full_system = np.array(full_system)
+
+    if complete_position is not None:
+        full_system = complete_matrix(full_matrix=full_system, position=complete_position)
+
+    if merged_matrix:
+        full_system = unmerge_matrix(full_system)
+
+    if states != "all":
+        causes_size = round(math.log2(full_system.shape[0]))
+        invalid_states = [
+            binary_distribution for binary_distribution in states
+            if len(binary_distribution) != causes_size or not set(binary_distribution) <= {"0", "1"}
+        ]
+        if len(invalid_states) > 0:
+            raise HTTPException(status_code=400, detail=f"States must have {causes_size} characters, a 0 or a 1 per cause: {invalid_states}")
+
+    if subsystem is not None:
+        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]), cache=marginalization_cache)
+        if states != "all":
+            states = ["".join([binary_distribution[i] for i in subsystem[1]]) for binary_distribution in states]
+
+    if states == "all":
+        causes_size = round(math.log2(full_system.shape[0]))
+        states = [index_to_binary(i, causes_size) for i in range(2**causes_size)]
+
+    responses = calculate_minimum_partitions(
+        full_system=full_system,
+        binary_distributions=states,
+        budget=budget,
+    )
+
+    elapsed_time_secs = (datetime.datetime.now() - start_date).total_seconds()
+    for res in responses:
+        res.stats["elapsed_time_secs"] = elapsed_time_secs
+
+    return responses
+
+def calculate_edges_cut_distance(db: Session, full_system, binary_distribution, subsystem, merged_matrix, complete_position=None, candidate=None, time_budget_secs=None, max_evaluations=None, cut_method="stoer_wagner") -> float:
+    start_date = datetime.datetime.now()
+    budget = SearchBudget(time_budget_secs=time_budget_secs, max_evaluations=max_evaluations)
     full_system = np.array(full_system)
 
     if complete_position is not None:
@@ -109,7 +160,7 @@ def calculate_edges_cut_distance(db: Session, full_system, binary_distribution,
         full_system = unmerge_matrix(full_system)
 
     if subsystem is not None:
-        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]))
+        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]), cache=marginalization_cache)
         binary_distribution = "".join([binary_distribution[i] for i in subsystem[1]])
 
     system_shape_rows, system_shape_columns = full_system.shape
@@ -124,14 +175,17 @@ def calculate_edges_cut_distance(db: Session, full_system, binary_distribution,
         presentNodesCount=causes_size,
         base_effect=tuple(range(effects_size)),
         base_cause=tuple(range(causes_size)),
+        budget=budget,
+        cut_method=cut_method,
     )
 
     res.stats["elapsed_time_secs"] = (datetime.datetime.now() - start_date).total_seconds()
 
     return res
 
-def calculate_min_cut_with_aco(db: Session, full_system, binary_distribution, subsystem, merged_matrix, complete_position=None, candidate=None) -> float:
+def calculate_min_cut_with_aco(db: Session, full_system, binary_distribution, subsystem, merged_matrix, complete_position=None, candidate=None, time_budget_secs=None, max_evaluations=None, seed=None, workers=None, stagnation_iterations=None, entropy_threshold=None, warm_start=False) -> float:
     start_date = datetime.datetime.now()
+    budget = SearchBudget(time_budget_secs=time_budget_secs, max_evaluations=max_evaluations)
     full_system = np.array(full_system)
 
     if complete_position is not None:
@@ -145,7 +199,7 @@ def calculate_min_cut_with_aco(db: Session, full_system, binary_distribution, su
         full_system = unmerge_matrix(full_system)
 
     if subsystem is not None:
-        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]))
+        full_system = get_subsystem_distribution(matrix=full_system, axis=1, effect=tuple(subsystem[0]), cause=tuple(subsystem[1]), cache=marginalization_cache)
         binary_distribution = "".join([binary_distribution[i] for i in subsystem[1]])
 
     system_shape_rows, system_shape_columns = full_system.shape
@@ -160,6 +214,12 @@ def calculate_min_cut_with_aco(db: Session, full_system, binary_distribution, su
         presentNodesCount=causes_size,
         base_effect=tuple(range(effects_size)),
         base_cause=tuple(range(causes_size)),
+        budget=budget,
+        seed=seed,
+        workers=workers,
+        stagnation_iterations=stagnation_iterations,
+        entropy_threshold=entropy_threshold,
+        warm_start=warm_start,
     )
 
     res.stats["elapsed_time_secs"] = (datetime.datetime.now() - start_date).total_seconds()
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional, Union
 from pydantic import BaseModel
 
 class BipartiteMatchResponse(BaseModel):
@@ -35,3 +35,20 @@ class SystemPartitionInput(BaseModel):
     candidate: Optional[List[int]] = None
     merged_matrix: Optional[bool] = False
     complete_position: Optional[int] = None
+    workers: Optional[int] = None
+    time_budget_secs: Optional[float] = None
+    max_evaluations: Optional[int] = None
+    cut_method: Literal["stoer_wagner", "spectral", "heatmap"] = "stoer_wagner"
+    seed: Optional[int] = None
+    stagnation_iterations: Optional[int] = None
+    entropy_threshold: Optional[float] = None
+    warm_start: Optional[bool] = False
+
+class SystemPartitionBatchInput(BaseModel):
+    full_system: List[List[float]]
+    states: Union[List[str], Literal["all"]] = "all"
+    subsystem: Optional[List[List[int]]] = None
+    merged_matrix: Optional[bool] = False
+    complete_position: Optional[int] = None
+    time_budget_secs: Optional[float] = None
+    max_evaluations: Optional[int] = None
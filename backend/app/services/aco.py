@@ -1,15 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import time
+from multiprocessing import get_context
 import numpy as np
-import random
-from copy import deepcopy
-from app.services.matching import CheckBipartite
 from app.schemas.graphs import GraphSchema
-from app.schemas.generation import GenGraphInput
-from app.services.gen_graph import GenerateGraph, TransformToGraphSchema, generateNodeLabels
 from .edges_cut_removal import calculate_edges_costs
 from .compare_partitions import MinimumPartitionResponse
+from .marginalization_lattice import MarginalizationLattice
+from .marginalization_cache import marginalization_cache
+from .search_budget import SearchBudget, search_stats
+from .connectivity import DisjointSet, find_bridges
+from .pheromone_store import PheromoneStore, pheromone_store
+
+ANT_SHARDS = 8
+DEFAULT_STAGNATION_ITERATIONS = 20
+PARTITION_CANDIDATES_CHUNK = 64
+
+def construct_paths(heuristic: np.ndarray, start: int, sizes: list, generators: list) -> np.ndarray:
+    """
+    Builds the tours of several shards of ants at once, the ants of each shard draw from the generator of the shard.
+    At every step each ant moves to an unvisited node with probability proportional to its heuristic
+    (pheromone^alpha * attractiveness), or to a random unvisited node when none is attractive.
+    Returns an array of ants x nodes (from, to) moves, ants in the order of the shards.
+    """
+    nodes_count = len(heuristic)
+    n_paths = sum(sizes)
+
+    order = np.empty((n_paths, nodes_count + 1), dtype=int)
+    order[:, 0] = order[:, -1] = start
+    visited = np.zeros((n_paths, nodes_count), dtype=bool)
+    visited[:, start] = True
+    ants = np.arange(n_paths)
+
+    for step in range(1, nodes_count):
+        weights = np.where(visited, 0.0, heuristic[order[:, step - 1]])
+        stuck = ~(weights.sum(axis=1) > 0)
+        weights[stuck] = ~visited[stuck]
+
+        cumulative = np.cumsum(weights, axis=1)
+        draws = np.concatenate([g.random(size) for g, size in zip(generators, sizes)]) * cumulative[:, -1]
+        moves = (cumulative > draws[:, np.newaxis]).argmax(axis=1)
+
+        order[:, step] = moves
+        visited[ants, moves] = True
+
+    return np.stack((order[:, :-1], order[:, 1:]), axis=2)
+
+def rank_descending(values: np.ndarray, keys: np.ndarray, chunk: int):
+    """
+    Lazily yields the indices of `values` from the largest value to the smallest, ties in increasing order of `keys`.
+    Each chunk of about `chunk` indices is taken with a partial selection and only that chunk gets sorted.
+    """
+    remaining = np.arange(len(values))
+
+    while len(remaining) > 0:
+        if len(remaining) > chunk:
+            threshold = np.partition(values[remaining], len(remaining) - chunk)[len(remaining) - chunk]
+            selected = remaining[values[remaining] >= threshold]
+            remaining = remaining[values[remaining] < threshold]
+        else:
+            selected, remaining = remaining, remaining[:0]
+
+        yield from selected[np.lexsort((keys[selected], -values[selected]))].tolist()
+
+def _construct_paths_shards(heuristic: np.ndarray, start: int, sizes: list, seeds: list) -> np.ndarray:
+    return construct_paths(heuristic, start, sizes, [np.random.default_rng(seed) for seed in seeds])
 
 class AntColony:
-    def __init__(self, graph: GraphSchema, n_ants, n_best, n_iterations, decay, alpha=1, beta=1):
+    """
+    Ant colony over a GraphSchema, backed by arrays: the distances between nodes are read from the graph once,
+    into a dense matrix with `inf` where there is no edge, and the pheromone is a matrix of the same shape.
+    Paths are arrays of (from, to) node indices.
+
+    The ants of an iteration are split in ANT_SHARDS shards, each one built with its own generator seeded from
+    (seed, iteration, shard) and merged in shard order, so a seed gives the same run with any number of `workers`.
+
+    Besides `n_iterations` and the budget, a run stops once for `stagnation_iterations` iterations neither the best
+    finite cost has improved nor the edge `generate_partitions` would remove has changed, or once the normalized
+    entropy of the pheromone drops below `entropy_threshold`. The metrics of every iteration are kept in `telemetry`
+    and the cause of the stop in `stop_reason`.
+
+    With a `pheromone_store` the colony starts from the pheromone saved by a previous run over the same graph, or over
+    a similar graph with the same nodes (see `PheromoneStore`), and saves its final pheromone for the next runs.
+    """
+
+    def __init__(self, graph: GraphSchema, n_ants, n_best, n_iterations, decay, alpha=1, beta=1, budget: SearchBudget = None, seed: int = None, workers: int = None, stagnation_iterations: int = None, entropy_threshold: float = None, pheromone_store: PheromoneStore = None):
         if not isinstance(graph, GraphSchema):
             raise ValueError("Expected a GraphSchema instance.")
         self.graph = graph
@@ -19,143 +94,228 @@ class AntColony:
         self.decay = decay
         self.alpha = alpha
         self.beta = beta
+        self.budget = budget
+        self.stagnation_iterations = stagnation_iterations
+        self.entropy_threshold = entropy_threshold
+        self.completed_iterations = 0
+        self.telemetry = []
+        self.stop_reason = "max_iterations"
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> 11) # fits a JSON number
+        self.workers = workers
+        self.rng = np.random.default_rng(self.seed)
         self.graph.set_nodes_map()
         nodes = self.graph.data
-        self.pheromone = [[1 / (len(nodes) * len(nodes))] * len(nodes) for _ in range(len(nodes))]
+        self.node_index = {node.id: idx for idx, node in enumerate(nodes)}
+        self.edges, self.edge_weights = self.build_edges()
+        self.distances = self.build_distances()
+        self.attractiveness = self.build_attractiveness()
+        self.active_edges, self.bridges, self.components_count = self.build_bridges()
+        self.pheromone = np.full((len(nodes), len(nodes)), 1 / (len(nodes) * len(nodes)))
+        self.pheromone_store = pheromone_store
+        self.warm_start = None
+        if pheromone_store is not None:
+            self.load_pheromone()
+
+    def node_ids(self) -> tuple:
+        return tuple(node.id for node in self.graph.data)
+
+    def load_pheromone(self):
+        # The stored pheromone is rescaled to the total of the uniform start, so deposits weigh the same
+        pheromone, self.warm_start = self.pheromone_store.load(self.node_ids(), self.distances)
+        if pheromone is not None and pheromone.sum() > 0:
+            self.pheromone = pheromone * (self.pheromone.sum() / pheromone.sum())
+        else:
+            self.warm_start = None
+
+    def build_edges(self):
+        # Edges as (from, to) node indices, edges without weight get nan
+        edges = [(idx, self.get_node_index_by_id(edge.nodeId), edge.weight) for idx, node in enumerate(self.graph.data) for edge in node.linkedTo]
+        indices = np.array([(i, j) for i, j, _ in edges], dtype=int).reshape(-1, 2)
+        weights = np.array([np.nan if w is None else w for _, _, w in edges], dtype=float)
+        return indices, weights
+
+    def build_distances(self) -> np.ndarray:
+        distances = np.full((len(self.graph.data), len(self.graph.data)), np.inf)
+        weighted = ~np.isnan(self.edge_weights)
+        distances[self.edges[weighted, 0], self.edges[weighted, 1]] = self.edge_weights[weighted]
+        return distances
+
+    def build_attractiveness(self) -> np.ndarray:
+        # Only edges with a positive finite weight attract the ants
+        attractiveness = np.zeros_like(self.distances)
+        reachable = (self.distances > 0) & np.isfinite(self.distances)
+        attractiveness[reachable] = (1 / self.distances[reachable]) ** self.beta
+        return attractiveness
+
+    def build_bridges(self):
+        # Edges of weight zero are the edges removed from the graph
+        nodes_count = len(self.graph.data)
+        active = np.flatnonzero(self.edge_weights != 0.0)
+        bridges = np.zeros(len(self.edges), dtype=bool)
+        bridges[active] = find_bridges(nodes_count, self.edges[active].tolist())
+
+        components = DisjointSet(nodes_count)
+        for u, v in self.edges[active].tolist():
+            components.union(u, v)
+
+        return active, bridges, components.components
 
     def run(self):
+        if self.workers is None or self.workers <= 1:
+            return self.run_iterations()
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn")) as executor:
+            return self.run_iterations(executor)
+
+    def run_iterations(self, executor: ProcessPoolExecutor = None):
         best_solutions = []
+        best_cost = float('inf')
+        partition_edge = self.partition_edge()
+        stagnant_iterations = 0
+
         for i in range(self.n_iterations):
-            all_paths = self.construct_solutions()
-            if i == 1:
-                print("la feromona", self.pheromone)
+            if self.budget is not None and self.budget.exhausted():
+                self.stop_reason = "budget"
+                break
+
+            start_time = time.perf_counter()
+            all_paths = self.construct_solutions(executor)
             self.spread_pheronome(all_paths, self.n_best)
             best_solutions.append(min(all_paths, key=lambda x: x[1]))
             self.evaporate_pheromone()
+            self.completed_iterations += 1
+
+            entropy = self.pheromone_entropy()
+            self.record_iteration(i, all_paths, entropy, time.perf_counter() - start_time)
+
+            partition_edge, previous_partition_edge = self.partition_edge(), partition_edge
+            if best_solutions[-1][1] < best_cost or partition_edge != previous_partition_edge:
+                best_cost = min(best_cost, best_solutions[-1][1])
+                stagnant_iterations = 0
+            else:
+                stagnant_iterations += 1
+
+            if self.stagnation_iterations and stagnant_iterations >= self.stagnation_iterations:
+                self.stop_reason = "stagnation"
+                break
+
+            if self.entropy_threshold is not None and entropy <= self.entropy_threshold:
+                self.stop_reason = "entropy"
+                break
+
+        if self.pheromone_store is not None and self.completed_iterations > 0:
+            self.pheromone_store.save(self.node_ids(), self.distances, self.pheromone)
 
         partitions = self.generate_partitions()
-        print("la feromona", self.pheromone)
         return best_solutions, partitions
 
-    def construct_solutions(self):
-        all_paths = []
-        for i in range(self.n_ants):
-            path = self.construct_path(0)
-            all_paths.append((path, self.path_length(path)))
-        return all_paths
-
-    def construct_path(self, start):
-        path = []
-        visited = set()
-        visited.add(start)
-        prev = start
-        for _ in range(len(self.graph.data) - 1):
-            move = self.select_move(self.pheromone[prev], self.get_distances(prev), visited)
-            path.append((prev, move))
-            prev = move
-            visited.add(move)
-        path.append((prev, start))
-        return path
-
-    def get_distances(self, node_idx):
-        node_id = self.graph.data[node_idx].id
-        distances = [float('inf')] * len(self.graph.data)
-        for edge in self.graph.data[node_idx].linkedTo:
-            to_node_idx = self.get_node_index_by_id(edge.nodeId)
-            distances[to_node_idx] = edge.weight if edge.weight is not None else float('inf')
-        return distances
+    def pheromone_entropy(self) -> float:
+        """
+        Shannon entropy of the pheromone normalized to [0, 1]: 1 when it is uniform, lower as it concentrates on a few edges.
+        """
+        p = self.pheromone.ravel() / self.pheromone.sum()
+        p = p[p > 0]
+        return float(-(p * np.log(p)).sum() / np.log(self.pheromone.size)) if self.pheromone.size > 1 else 0.0
+
+    def record_iteration(self, iteration, all_paths, entropy, elapsed_secs):
+        lengths = np.array([length for _, length in all_paths])
+        finite = lengths[np.isfinite(lengths)]
+        self.telemetry.append({
+            "iteration": iteration,
+            "best_cost": float(finite.min()) if len(finite) > 0 else None,
+            "mean_cost": float(finite.mean()) if len(finite) > 0 else None,
+            "ms": elapsed_secs * 1000,
+            "ants": len(all_paths),
+            "pheromone_entropy": entropy,
+        })
+
+    def heuristic(self) -> np.ndarray:
+        return self.pheromone ** self.alpha * self.attractiveness
+
+    def construct_solutions(self, executor: ProcessPoolExecutor = None):
+        heuristic = self.heuristic()
+        sizes = [len(shard) for shard in np.array_split(np.arange(self.n_ants), min(self.n_ants, ANT_SHARDS))]
+        seeds = [(self.seed, self.completed_iterations, shard) for shard in range(len(sizes))]
+
+        if executor is None:
+            paths = _construct_paths_shards(heuristic, 0, sizes, seeds)
+        else:
+            groups = [group.tolist() for group in np.array_split(np.arange(len(sizes)), min(self.workers, len(sizes)))]
+            paths = np.concatenate(list(executor.map(
+                _construct_paths_shards,
+                repeat(heuristic),
+                repeat(0),
+                [[sizes[k] for k in group] for group in groups],
+                [[seeds[k] for k in group] for group in groups],
+            )))
+        lengths = self.distances[paths[..., 0], paths[..., 1]].sum(axis=1)
+        return list(zip(paths, lengths))
+
+    def construct_paths(self, start, n_paths, rng: np.random.Generator = None):
+        return construct_paths(self.heuristic(), start, [n_paths], [self.rng if rng is None else rng])
 
     def get_node_index_by_id(self, node_id):
-        for idx, node in enumerate(self.graph.data):
-            if node.id == node_id:
-                return idx
-        raise ValueError(f"Node id {node_id} not found in graph.")
-
-    def select_move(self, pheromone, distances, visited):
-        pheromone = list(pheromone)
-        pheromone = [p ** self.alpha for p in pheromone]
-        attractiveness = [1 / d if d > 0 else 0 for d in distances]
-        row = zip(pheromone, attractiveness)
-        row = [(phero, attr) for phero, attr in row if attr != 0 and attr not in visited]
-        if not row:
-            return random.choice([i for i in range(len(distances)) if i not in visited])
-        norm_row = [phero * attr for phero, attr in row]
-        sum_row = sum(norm_row)
-        norm_row = [nr / sum_row for nr in norm_row]
-        move = random.choices(range(len(row)), norm_row)[0]
-        return move
-
-    def path_length(self, path):
-        total_distance = 0
-        for ele in path:
-            total_distance += self.get_distances(ele[0])[ele[1]]
-        return total_distance
+        if node_id not in self.node_index:
+            raise ValueError(f"Node id {node_id} not found in graph.")
+        return self.node_index[node_id]
 
     def spread_pheronome(self, all_paths, n_best):
         sorted_paths = sorted(all_paths, key=lambda x: x[1])
         for path, dist in sorted_paths[:n_best]:
-            for move in path:
-                weight = self.get_distances(move[0])[move[1]]
-                if weight > 0:  # Evitar división por cero
-                    self.pheromone[move[0]][move[1]] += 1.0 / weight
+            weights = self.distances[path[:, 0], path[:, 1]]
+            deposit = np.zeros_like(weights)
+            np.divide(1.0, weights, out=deposit, where=weights > 0)  # Evitar división por cero
+            np.add.at(self.pheromone, (path[:, 0], path[:, 1]), deposit)
 
     def evaporate_pheromone(self):
-        self.pheromone = [[self.decay * phero for phero in row] for row in self.pheromone]
+        self.pheromone *= self.decay
+
+    def partition_edge(self):
+        """
+        Index in `self.edges` of the edge with the most pheromone whose removal leaves the graph in exactly two
+        connected components, None when there is no such edge.
+
+        The bridges of the graph are found once, so removing a candidate edge gives one more component when it is
+        a bridge and the same components otherwise. The candidates are ranked in chunks of PARTITION_CANDIDATES_CHUNK
+        with a partial selection, only the chunks before the chosen edge get sorted.
+        """
+        nodes_count = len(self.graph.data)
+        candidates = np.flatnonzero(self.edges[:, 0] != self.edges[:, 1])
+        pheromone = self.pheromone[self.edges[candidates, 0], self.edges[candidates, 1]]
+        positions = self.edges[candidates, 0] * nodes_count + self.edges[candidates, 1]
+
+        for k in rank_descending(pheromone, positions, PARTITION_CANDIDATES_CHUNK):
+            edge = int(candidates[k])
+            if self.components_count + self.bridges[edge] == 2:
+                return edge
+
+        return None
 
     def generate_partitions(self):
-        pheromone_edges = []
-        for i in range(len(self.pheromone)):
-            for j in range(len(self.pheromone[i])):
-                pheromone_edges.append((self.pheromone[i][j], i, j))
-        pheromone_edges.sort(reverse=True, key=lambda x: x[0])
-
-        for _, i, j in pheromone_edges:
-            if i == j:
-                continue  # No actualizar aristas entre un nodo y sí mismo
-
-            from_node_id = self.graph.data[i].id
-            to_node_id = self.graph.data[j].id
-
-            # Verificar si la arista existe antes de intentar actualizar
-            from_node = self.graph.get_node_by_id(from_node_id)
-            if from_node and any(edge.nodeId == to_node_id for edge in from_node.linkedTo):
-                # Crear una copia del grafo y eliminar el borde con la mayor cantidad de feromonas
-                temp_graph = deepcopy(self.graph)  # Usar deepcopy para clonar el grafo correctamente
-                temp_graph.update_edge_weight(from_node_id=from_node_id, to_node_id=to_node_id, new_weight=0.0)
-
-                bip = CheckBipartite(g=temp_graph)
-                bip.exclude_zero_weights = True
-                check_bipartite_res = bip.process()
-
-                if check_bipartite_res.isBipartite and len(check_bipartite_res.connectedComponents) == 2:
-                    partitions = [[], []]
-                    for idx, component in enumerate(check_bipartite_res.connectedComponents.values()):
-                        for node in component:
-                            partitions[idx].append(node)
-                    return partitions
-            else:
-                print(f"Arista no encontrada: {from_node_id} -> {to_node_id}")
+        """
+        Removes the edge with the most pheromone whose removal leaves the graph in exactly two connected components
+        (see `partition_edge`), and returns the node ids of both components.
+        """
+        edge = self.partition_edge()
+        if edge is None:
+            # Retornar particiones vacías si no se encuentra una bipartición válida
+            return [[], []]
+
+        partition = DisjointSet(len(self.graph.data))
+        for e in self.active_edges.tolist():
+            if e != edge:
+                partition.union(*self.edges[e].tolist())
 
-        # Retornar particiones vacías si no se encuentra una bipartición válida
-        return [[], []]
+        return [[self.graph.data[i].id for i in group] for group in partition.groups()]
 
-def run_aco(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: int, futureNodesCount: int, base_effect: tuple, base_cause: tuple):
+def run_aco(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: int, futureNodesCount: int, base_effect: tuple, base_cause: tuple, budget: SearchBudget = None, seed: int = None, workers: int = None, stagnation_iterations: int = None, entropy_threshold: float = None, warm_start: bool = False):
     p_matrix = np.array(p_matrix)
 
     response = MinimumPartitionResponse(
         binary_distribution=binary_distribution,
     )
 
-    g_dict = GenerateGraph(
-        GenGraphInput(
-            nodesNumber=presentNodesCount + futureNodesCount,
-            isBipartite=True,
-            presentNodesCount=presentNodesCount,
-            futureNodesCount=futureNodesCount,
-        )
-    )
-
-    g = TransformToGraphSchema(g_dict)
+    lattice = MarginalizationLattice(p_matrix, cache=marginalization_cache)
 
     min_cut, adjayency_matrix = calculate_edges_costs(
         p_matrix=p_matrix,
@@ -164,10 +324,20 @@ def run_aco(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: i
         futureNodesCount=futureNodesCount,
         base_effect=base_effect,
         base_cause=base_cause,
-        g=g
+        lattice=lattice,
+        budget=budget,
     )
 
+    g = min_cut.graph
     response.graph = g.model_dump()
+    response.stats.update(search_stats(
+        covered=min_cut.evaluated_edges,
+        total=min_cut.total_edges,
+        interrupted=min_cut.interrupted,
+        proven_optimal=min_cut.cost == 0.0,
+    ))
+    response.stats["marginalizations"] = lattice.stats()
+    response.stats["marginalization_cache"] = marginalization_cache.stats()
 
     if min_cut.cost < float('inf'):
         response.distance = min_cut.cost
@@ -176,8 +346,30 @@ def run_aco(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: i
         return response
 
     # ACO based con adjayency matrix
-    ant_colony = AntColony(graph=g, n_ants=len(adjayency_matrix) * 2, n_best=2, n_iterations=100, decay=0.85, alpha=-1, beta=1)
+    ant_colony = AntColony(
+        graph=g,
+        n_ants=len(adjayency_matrix) * 2,
+        n_best=2,
+        n_iterations=100,
+        decay=0.85,
+        alpha=-1,
+        beta=1,
+        budget=budget,
+        seed=seed,
+        workers=workers,
+        stagnation_iterations=DEFAULT_STAGNATION_ITERATIONS if stagnation_iterations is None else stagnation_iterations,
+        entropy_threshold=entropy_threshold,
+        pheromone_store=pheromone_store if warm_start else None,
+    )
     best_solutions, partitions = ant_colony.run()
     response.partition = partitions
+    response.stats["aco_iterations"] = ant_colony.completed_iterations
+    response.stats["aco_seed"] = ant_colony.seed
+    response.stats["aco_stop_reason"] = ant_colony.stop_reason
+    response.stats["aco_telemetry"] = ant_colony.telemetry
+    if warm_start:
+        response.stats["aco_warm_start"] = ant_colony.warm_start
+        response.stats["pheromone_store"] = pheromone_store.stats()
+    response.stats["budget_exhausted"] = response.stats["budget_exhausted"] or ant_colony.stop_reason == "budget"
 
     return response
@@ -0,0 +1,69 @@
+from functools import lru_cache
+import numpy as np
+
+def binary_to_index(binary: str, mask=None, unmask=None) -> int:
+    """
+    Index of a state given as a little endian binary string, where the i-th character is the state of the i-th node.
+    If a mask (positions to keep) or an unmask (positions to drop) is given, the index is taken over the remaining positions.
+    """
+    index = int(binary[::-1], 2) if binary != "" else 0
+
+    if mask is None and unmask is None:
+        return index
+
+    return compress_index(index, kept_positions(len(binary), mask=mask, unmask=unmask))
+
+def index_to_binary(index: int, n: int) -> str:
+    """
+    Little endian binary string of n characters of a state index, the inverse of `binary_to_index`.
+    """
+    return "".join(str((index >> i) & 1) for i in range(n))
+
+def kept_positions(n: int, mask=None, unmask=None) -> tuple:
+    """
+    Positions among the first n bits that are kept by a mask (positions to keep) or an unmask (positions to drop).
+    """
+    if mask is not None:
+        mask = set(mask)
+        return tuple(i for i in range(n) if i in mask)
+
+    if unmask is not None:
+        unmask = set(unmask)
+        return tuple(i for i in range(n) if i not in unmask)
+
+    return tuple(range(n))
+
+def compress_index(index: int, positions: tuple) -> int:
+    """
+    Index of the state made only by the bits of `index` at `positions`, packed in the same order.
+    """
+    compressed = 0
+    for j, p in enumerate(positions):
+        compressed |= ((index >> p) & 1) << j
+
+    return compressed
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+@lru_cache(maxsize=None)
+def bit_table(n: int) -> np.ndarray:
+    """
+    Array of shape (2^n, n) where the cell [i, j] is the j-th bit of the state i.
+    """
+    states = np.arange(2**n)
+    return _read_only(((states[:, None] >> np.arange(n)) & 1).astype(np.uint8))
+
+@lru_cache(maxsize=256)
+def compressed_indices(n: int, positions: tuple) -> np.ndarray:
+    """
+    Gather array of length 2^n with the compressed index of every state over the given bit positions.
+    """
+    states = np.arange(2**n)
+    compressed = np.zeros(2**n, dtype=np.intp)
+
+    for j, p in enumerate(positions):
+        compressed |= ((states >> p) & 1) << j
+
+    return _read_only(compressed)
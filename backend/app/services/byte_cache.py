@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+
+class ByteBudgetCache:
+    """
+    LRU cache of numpy arrays bounded by the total bytes of the stored arrays.
+
+    The least recently used entries are evicted once the stored arrays exceed `max_bytes`,
+    arrays larger than the whole budget are never stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def store(self, key, value: np.ndarray) -> np.ndarray:
+        if value.nbytes > self.max_bytes:
+            return value
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+
+            self.entries[key] = value
+            self.bytes += value.nbytes
+
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+        return value
+
+    def discard(self, predicate):
+        """
+        Remove every entry whose key satisfies the predicate, these are not counted as evictions.
+        """
+        with self.lock:
+            for key in [k for k in self.entries if predicate(k)]:
+                self.bytes -= self.entries.pop(key).nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses
+
+            return {
+                "size": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests > 0 else 0.0,
+            }
@@ -1,45 +1,18 @@
-from typing import Dict, Tuple, Optional, Any
+from typing import Optional, Any
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
 import numpy as np
 import math
 from pydantic import BaseModel, Field
-from .matrix import get_binary_position, product_tensor_with_cut, recursive_marginalization, get_emd
-from .partitions_generator import gen_system_partitions
-
-class Memo(BaseModel):
-    binary_distribution: str = ""
-    matrix: Dict[Tuple, Dict[Tuple, np.ndarray]] = {}
-    marginalizations: Dict[Tuple, Dict[Tuple, np.ndarray]] = {}
-    used_count: int = 0
-
-    class Config:
-        arbitrary_types_allowed = True
-
-    def get(self, effect: tuple, cause: tuple, scope=None):
-        space = self.matrix
-
-        if scope == "MG":
-            space = self.marginalizations
-
-        try:
-            m = space[effect][cause]
-            self.used_count += 1
-            return m
-        except:
-            return None
-
-    def add(self, effect: tuple, cause: tuple, m, scope=None):
-        space = self.matrix
-
-        if scope == "MG":
-            space = self.marginalizations
-
-        if self.get(effect=effect, cause=cause, scope=scope) is not None:
-            return
-
-        if space.get(effect) is None:
-            space[effect] = {}
-
-        space[effect][cause] = m
+from .matrix import product_tensor, product_tensor_row, product_tensor_with_cut, get_emd
+from .emd import node_marginals, marginal_lower_bound, total_variation
+from .marginalization_lattice import MarginalizationLattice
+from .marginalization_cache import marginalization_cache
+from .memo import Memo
+from .bit_index import binary_to_index, compressed_indices, bit_table
+from .partitions_generator import gen_gray_partitions, count_gray_positions, count_gray_partitions
+from .search_budget import SearchBudget, search_stats
 
 class MinimumPartitionResponse(BaseModel):
     binary_distribution: Optional[str] = None
@@ -57,13 +30,14 @@ def find_insertion_pos(l, to_insert):
 
     return len(l)
 
-def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str, target_effect: tuple, target_cause:tuple, base_cause: tuple, memo: Memo):
+def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str, target_effect: tuple, target_cause:tuple, base_cause: tuple, memo: Memo, lattice: MarginalizationLattice = None):
     """
     Calculate the probability distribution of a target effect given a target cause and a base cause.
     The strategy used at this level is top-down recursion with memoization.
     Where the probability distribution of the target effect is calculated by the product tensor of the leftmost target effect variable and the probability distribution of the rightest target effect, which is calculated recursively.
 
     The memoization structure is accessed by a target effect and a target cause.
+    The marginalizations of the matrix over the target cause are taken from the lattice, so they are calculated once per cause subset.
 
     Args:
         p_matrix (np.ndarray): The probability matrix.
@@ -72,6 +46,7 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
         target_cause (tuple): The target cause to calculate the probability.
         base_cause (tuple): The base cause of the target effect.
         memo (Memo): The memoization object to store the results.
+        lattice (MarginalizationLattice): The marginalizations of p_matrix, created from p_matrix if not given.
 
     Returns:
         np.ndarray: The probability distribution of the target effect given the target cause and the base cause.
@@ -79,6 +54,9 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
     if not target_effect:
         return None
 
+    if lattice is None:
+        lattice = MarginalizationLattice(p_matrix)
+
     memoized_matrix = memo.get(target_effect, target_cause)
     if memoized_matrix is not None:
         return memoized_matrix
@@ -90,7 +68,7 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
     diff_target_cause = list(base_cause_set.difference(target_cause))
     diff_target_cause.sort()
 
-    leftmost_row_index = get_binary_position(binary=binary_distribution)
+    leftmost_row_index = binary_to_index(binary_distribution)
     leftmost_columns = [leftmost_target*2, (leftmost_target*2)+1]
     leftmost_resultant = p_matrix[leftmost_row_index, leftmost_columns][np.newaxis, :]
 
@@ -99,17 +77,10 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
         if memoized_left_matrix is not None:
             leftmost_resultant = memoized_left_matrix
         else:
-            lefmost_marginalized = recursive_marginalization(
-                matrix=p_matrix[:, leftmost_columns],
-                tensors=len(base_cause),
-                positions=diff_target_cause,
-                axis=1,
-            )
+            lefmost_marginalized = lattice.get(target_cause)
 
-            memo.add(target_effect, target_cause, lefmost_marginalized, scope="MG")
-
-            leftmost_row_index = get_binary_position(binary=binary_distribution, mask=target_cause)
-            leftmost_resultant = lefmost_marginalized[leftmost_row_index, [0, 1]][np.newaxis, :]
+            leftmost_row_index = binary_to_index(binary_distribution, mask=target_cause)
+            leftmost_resultant = lefmost_marginalized[leftmost_row_index, leftmost_columns][np.newaxis, :]
 
     rightest_resultant = get_probability_distribution(
         p_matrix=p_matrix,
@@ -118,6 +89,7 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
         target_cause=target_cause,
         base_cause=base_cause,
         memo=memo,
+        lattice=lattice,
     )
 
     if rightest_resultant is None:
@@ -126,7 +98,7 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
     memo.add(rightest, target_cause, rightest_resultant) # memoize rightest resultant
 
     concatenated_matrix = np.concatenate([leftmost_resultant, rightest_resultant], axis=1)
-    row_index = get_binary_position(binary=binary_distribution, mask=target_cause)
+    row_index = binary_to_index(binary_distribution, mask=target_cause)
     cut = leftmost_resultant.shape[1]
     insert_position = find_insertion_pos(l=rightest, to_insert=leftmost_target)
 
@@ -136,76 +108,495 @@ def get_probability_distribution(p_matrix: np.ndarray, binary_distribution: str,
 
     return r
 
-def calculate_partition_distance(matrix: np.ndarray, original: np.ndarray, binary_distribution: str, base_cause: tuple, partitions: list[tuple], memo: Memo):
+MASS_TOLERANCE = 1e-9
+PARALLEL_MIN_POSITIONS = 2**17 # below this the walk is faster than starting a spawn pool
+
+class PartitionEvaluator:
     """
-    Calculate the distance between two partitions of a system given a matrix and a binary distribution.
+    Incremental evaluation of the joint distribution of the system cut by a partition [a, b, negative_a, negative_b].
 
-    Args:
-        matrix (np.ndarray): The matrix of the system.
-        original (np.ndarray): The original matrix of the system.
-        binary_distribution (str): The binary distribution of the system.
-        base_cause (tuple): The base cause of the system.
-        partitions (list[tuple]): A list containing the partitions of the system.
-        memo (Memo): The memoization object to store the results.
+    Every effect contributes the factor of its distribution given only the causes of its side, at the state of the
+    binary distribution: P(e | b) for the effects in a and P(e | negative_b) for the others. The factors are memoized
+    in the "MG" scope of the memo, and the joint is the product tensor of the factors of the high half of the effects
+    with the factors of the low half. Only the halves whose factors changed since the previous partition are rebuilt,
+    so a walk where consecutive partitions move a single node mostly rebuilds a single half.
+    """
 
-    Returns:
-        float: The distance between the two partitions.
+    def __init__(self, matrix: np.ndarray, binary_distribution: str, memo: Memo, lattice: MarginalizationLattice):
+        self.binary_distribution = binary_distribution
+        self.memo = memo
+        self.lattice = lattice
+        self.effects = matrix.shape[1] // 2
+        self.split = self.effects // 2
+        self.sides = [None] * self.effects
+        self.factors = np.zeros(2 * self.effects)
+        self.low = None
+        self.high = None
+        self.rebuilt_halves = 0
+
+    def factor(self, effect: int, cause: tuple) -> np.ndarray:
+        factor = self.memo.get((effect,), cause, scope="MG")
+
+        if factor is None:
+            row_index = binary_to_index(self.binary_distribution, mask=cause)
+            factor = self.lattice.get(cause)[row_index, effect*2:(effect*2)+2]
+            self.memo.add((effect,), cause, factor, scope="MG")
+
+        return factor
+
+    def update(self, partition: list):
+        """
+        Set the factors of the effects for a partition, the joint is rebuilt lazily by `joint`.
+        """
+        a, b, negative_a, negative_b = partition
+        a = set(a)
+
+        for effect in range(self.effects):
+            cause = b if effect in a else negative_b
+
+            if self.sides[effect] == cause:
+                continue
+
+            self.sides[effect] = cause
+            self.factors[effect*2:(effect*2)+2] = self.factor(effect, cause)
+
+            if effect < self.split:
+                self.low = None
+            else:
+                self.high = None
+
+    def marginals(self) -> np.ndarray:
+        """
+        Probability of every effect being 1 under the joint of the current partition, i.e. the second value of each factor.
+        """
+        return self.factors[1::2]
+
+    def mass(self) -> float:
+        return float(np.prod(self.factors[0::2] + self.factors[1::2]))
+
+    def joint(self) -> np.ndarray:
+        if self.low is None:
+            self.low = product_tensor_row(self.factors[:2*self.split])
+            self.rebuilt_halves += 1
+
+        if self.high is None:
+            self.high = product_tensor_row(self.factors[2*self.split:])
+            self.rebuilt_halves += 1
+
+        return np.multiply.outer(self.high, self.low).ravel()
+
+    def distribution(self, partition: list) -> np.ndarray:
+        self.update(partition)
+
+        return self.joint()
+
+class PartitionSearch:
+    """
+    Counters, budget and best distance of a search for the minimum partition, where the best distance can be shared between processes.
     """
-    partition_a = get_probability_distribution(p_matrix=matrix, binary_distribution=binary_distribution, target_effect=partitions[0], target_cause=partitions[1], base_cause=base_cause, memo=memo)
 
-    partition_b = get_probability_distribution(p_matrix=matrix, binary_distribution=binary_distribution, target_effect=partitions[2], target_cause=partitions[3], base_cause=base_cause, memo=memo)
+    def __init__(self, shared_best=None, budget: SearchBudget = None):
+        self.shared_best = shared_best
+        self.budget = budget
+        self.evaluated = 0
+        self.pruned = 0
+        self.visited = 0
+        self.interrupted = False
 
-    partition_joined = np.concatenate([partition_a, partition_b], axis=1)
-    partition_joined_m = product_tensor_with_cut(partition_joined, 0, partition_a.shape[1], partitions[0])
+    def counters(self) -> tuple:
+        return self.evaluated, self.pruned, self.visited, self.interrupted
 
-    return get_emd(original[0], partition_joined_m[0]), partition_joined_m[0]
+    def merge(self, counters: tuple):
+        evaluated, pruned, visited, interrupted = counters
 
-def calculate_minimum_partition(full_system: np.ndarray, binary_distribution: str) -> MinimumPartitionResponse:
+        self.evaluated += evaluated
+        self.pruned += pruned
+        self.visited += visited
+        self.interrupted = self.interrupted or interrupted
+
+    def best(self, local_best: float) -> float:
+        if self.shared_best is None:
+            return local_best
+
+        return min(local_best, self.shared_best.value)
+
+    def improve(self, distance: float):
+        if self.shared_best is None:
+            return
+
+        with self.shared_best.get_lock():
+            if distance < self.shared_best.value:
+                self.shared_best.value = distance
+
+def find_minimum_partition(evaluator: PartitionEvaluator, original: np.ndarray, partitions, search: PartitionSearch = None):
     """
-    Calculate the minimum partition of a system given a matrix and a binary distribution.
+    Evaluate the partitions in order and keep the first one with the minimum distance, with branch and bound.
+
+    Before the exact EMD of a partition, two lower bounds of it are compared with the best distance so far,
+    and the partition is pruned when a bound is not below it: the L1 difference of the effect marginals, which needs
+    only the factors of the partition, and then the total variation of the joint distributions. Both bounds hold for
+    distributions with the same mass, so they are skipped otherwise. The search stops as soon as a partition with
+    distance 0 is found, or when the budget of the search is exhausted. Partitions whose distance cannot be calculated are skipped.
 
     Args:
-        original_system (list): The original system.
-        binary_distribution (str): The binary distribution of the system.
+        evaluator (PartitionEvaluator): The evaluator of the distribution of each partition.
+        original (np.ndarray): The original distribution of the system.
+        partitions (iterable): The partitions to evaluate.
+        search (PartitionSearch): The counters and budget of the search, and the best distance shared with other searches if any.
 
     Returns:
-        MinimumPartitionResponse: The minimum partition of the system with its details
+        tuple: The minimum distance, its distribution and its partition (None if no partition was evaluated).
     """
-    system_shape_rows, system_shape_columns = full_system.shape
+    if search is None:
+        search = PartitionSearch()
 
-    memo = Memo(binary_distribution=binary_distribution)
-    base_effect = tuple(range(round(system_shape_columns/2)))
-    base_cause = tuple(range(round(math.log2(system_shape_rows))))
-    partitions = gen_system_partitions([base_effect, base_cause])
-
-    original_distribution = get_probability_distribution(p_matrix=full_system, binary_distribution=binary_distribution, target_effect=base_effect, target_cause=base_cause, base_cause=base_cause, memo=memo)
+    original_marginals = node_marginals(original[0])
+    original_mass = float(original[0].sum())
 
     min_distance = float("inf")
-    min_partition = None
     min_distribution = None
+    min_partition = None
 
     for partition in partitions:
-        # print("Calculating partition distance of:", partition)
+        best = search.best(min_distance)
+        if best == 0.0:
+            break
+
+        if search.budget is not None and search.budget.exhausted():
+            search.interrupted = True
+            break
+
+        search.visited += 1
+
         try:
-          distance, dist = calculate_partition_distance(full_system, original_distribution, binary_distribution, base_cause, partition, memo)
-          absolute_distance = abs(distance)
+          evaluator.update(partition)
+          bounded = abs(evaluator.mass() - original_mass) < MASS_TOLERANCE
+
+          if bounded and marginal_lower_bound(original_marginals, evaluator.marginals()) >= best:
+              search.pruned += 1
+              continue
+
+          dist = evaluator.joint()
+
+          if bounded and total_variation(original[0], dist) >= best:
+              search.pruned += 1
+              continue
+
+          absolute_distance = abs(get_emd(original[0], dist))
+          search.evaluated += 1
+          if search.budget is not None:
+              search.budget.spend()
 
           if absolute_distance < min_distance:
               min_distance = absolute_distance
-              min_partition = partition
               min_distribution = dist
+              min_partition = partition
+              search.improve(absolute_distance)
         except Exception as e:
-            # print("-> Error calculating partition distance:", e, partition)
             continue
 
+    return min_distance, min_distribution, min_partition
+
+_worker_state = {}
+
+def _share_array(array: np.ndarray) -> SharedMemory:
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+
+    return shm
+
+def _attach_array(name: str, shape: tuple, dtype: str):
+    shm = SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.setflags(write=False)
+
+    return shm, array
+
+def _init_partition_worker(system: tuple, original: tuple, binary_distribution: str, shared_best, budget: tuple):
+    system_shm, full_system = _attach_array(*system)
+    original_shm, original_distribution = _attach_array(*original)
+
+    system_shape_rows, system_shape_columns = full_system.shape
+    base_effect = tuple(range(round(system_shape_columns/2)))
+    base_cause = tuple(range(round(math.log2(system_shape_rows))))
+
+    _worker_state.update(
+        shared_memory=(system_shm, original_shm),
+        full_system=full_system,
+        original_distribution=original_distribution,
+        binary_distribution=binary_distribution,
+        base_effect=base_effect,
+        base_cause=base_cause,
+        shared_best=shared_best,
+        budget=budget,
+        evaluator=PartitionEvaluator(
+            full_system,
+            binary_distribution,
+            Memo(binary_distribution=binary_distribution),
+            MarginalizationLattice(full_system, cache=marginalization_cache),
+        ),
+    )
+
+def _evaluate_partition_range(start: int, stop: int):
+    state = _worker_state
+    deadline, max_evaluations, shared_evaluations = state["budget"]
+    budget = SearchBudget(deadline=deadline, max_evaluations=max_evaluations, shared_evaluations=shared_evaluations)
+    search = PartitionSearch(shared_best=state["shared_best"], budget=budget)
+
+    min_distance, min_distribution, min_partition = find_minimum_partition(
+        state["evaluator"],
+        state["original_distribution"],
+        gen_gray_partitions([state["base_effect"], state["base_cause"]], start, stop),
+        search,
+    )
+
+    return min_distance, min_distribution, min_partition, search.counters()
+
+def find_minimum_partition_parallel(full_system: np.ndarray, original: np.ndarray, binary_distribution: str, positions: int, workers: int, budget: SearchBudget = None, shards_per_worker: int = 4):
+    """
+    Shard the walk over the partitions of the system in contiguous ranges of positions evaluated by a pool of processes, and reduce the results to the global minimum.
+    The TPM and the original distribution are shared with the workers through shared memory, each worker keeps its own evaluator.
+    The best distance and the evaluations of the budget are shared too, so every worker prunes with the global best so far. The minimum distance is the
+    same as in the sequential evaluation; among partitions with the same distance, another one may be returned.
+
+    Returns:
+        tuple: The minimum distance, its distribution, its partition (None if no partition was evaluated) and the search counters.
+    """
+    full_system = np.ascontiguousarray(full_system)
+    original = np.ascontiguousarray(original)
+    shards = max(1, min(positions, workers*shards_per_worker))
+    bounds = np.linspace(0, positions, shards + 1).astype(int).tolist()
+
+    context = get_context("spawn")
+    shared_best = context.Value("d", float("inf"))
+    budget = budget if budget is not None else SearchBudget()
+    shared_evaluations = context.Value("q", budget.evaluations)
+    system_shm = _share_array(full_system)
+    original_shm = _share_array(original)
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_partition_worker,
+            initargs=(
+                (system_shm.name, full_system.shape, full_system.dtype.str),
+                (original_shm.name, original.shape, original.dtype.str),
+                binary_distribution,
+                shared_best,
+                (budget.deadline, budget.max_evaluations, shared_evaluations),
+            ),
+        ) as executor:
+            results = list(executor.map(_evaluate_partition_range, bounds[:-1], bounds[1:]))
+    finally:
+        for shm in (system_shm, original_shm):
+            shm.close()
+            shm.unlink()
+
+    search = PartitionSearch(budget=budget)
+    for r in results:
+        search.merge(r[3])
+    budget.spend(shared_evaluations.value - budget.evaluations)
+
+    results = [r for r in results if r[2] is not None]
+    if len(results) == 0:
+        return float("inf"), None, None, search
+
+    min_distance, min_distribution, min_partition, _ = min(results, key=lambda r: r[0])
+
+    return min_distance, min_distribution, min_partition, search
+
+def calculate_minimum_partition(full_system: np.ndarray, binary_distribution: str, workers: int = None, budget: SearchBudget = None) -> MinimumPartitionResponse:
+    """
+    Calculate the minimum partition of a system given a matrix and a binary distribution.
+    The partitions are visited following a Gray code walk, so consecutive partitions share most of their factors.
+
+    Args:
+        original_system (list): The original system.
+        binary_distribution (str): The binary distribution of the system.
+        workers (int): Number of processes evaluating the partitions in parallel, sequential if not greater than 1
+            or if the system has fewer than PARALLEL_MIN_POSITIONS partitions.
+        budget (SearchBudget): Time or evaluation budget, when exhausted the best partition found so far is returned.
+
+    Returns:
+        MinimumPartitionResponse: The minimum partition of the system with its details
+    """
+    system_shape_rows, system_shape_columns = full_system.shape
+
+    memo = Memo(binary_distribution=binary_distribution)
+    lattice = MarginalizationLattice(full_system, cache=marginalization_cache)
+    base_effect = tuple(range(round(system_shape_columns/2)))
+    base_cause = tuple(range(round(math.log2(system_shape_rows))))
+    original_distribution = get_probability_distribution(p_matrix=full_system, binary_distribution=binary_distribution, target_effect=base_effect, target_cause=base_cause, base_cause=base_cause, memo=memo, lattice=lattice)
+
+    positions = count_gray_positions([base_effect, base_cause])
+    if workers is None or positions < PARALLEL_MIN_POSITIONS:
+        workers = 1
+
+    if workers > 1:
+        min_distance, min_distribution, min_partition, search = find_minimum_partition_parallel(full_system, original_distribution, binary_distribution, positions, workers, budget)
+        rebuilt_halves = None
+    else:
+        evaluator = PartitionEvaluator(full_system, binary_distribution, memo, lattice)
+        partitions = gen_gray_partitions([base_effect, base_cause])
+        search = PartitionSearch(budget=budget)
+        min_distance, min_distribution, min_partition = find_minimum_partition(evaluator, original_distribution, partitions, search)
+        rebuilt_halves = evaluator.rebuilt_halves
+
     res = MinimumPartitionResponse(binary_distribution=binary_distribution, partition=min_partition, distance=min_distance)
 
-    res.stats["memoized_matrices"] = len(memo.matrix)
-    res.stats["memoized_marginalizations"] = len(memo.marginalizations)
-    res.stats["total_saved_matrix_calculations"] = memo.used_count
+    res.stats["workers"] = max(workers, 1)
+    res.stats["evaluated_partitions"] = search.evaluated
+    res.stats["pruned_partitions"] = search.pruned
+    res.stats.update(search_stats(
+        covered=search.visited,
+        total=count_gray_partitions([base_effect, base_cause]),
+        interrupted=search.interrupted,
+        proven_optimal=not search.interrupted,
+    ))
+    res.stats["rebuilt_halves"] = rebuilt_halves
+    res.stats["memoized_matrices"] = len(memo)
+    res.stats["memo"] = memo.stats()
+    res.stats["marginalizations"] = lattice.stats()
+    res.stats["marginalization_cache"] = marginalization_cache.stats()
+    res.stats["total_saved_matrix_calculations"] = memo.hits
 
     res.original_distribution = original_distribution[0].tolist()
     if min_distribution is not None:
         res.min_cut_distribution = min_distribution.tolist()
 
-    return res
\ No newline at end of file
+    return res
+
+def state_factors(lattice: MarginalizationLattice, cause: tuple, rows: np.ndarray) -> np.ndarray:
+    """
+    Rows of the marginalization of the TPM over the given causes for several states at once, one row per state.
+    """
+    return lattice.get(cause)[compressed_indices(lattice.tensors, tuple(sorted(cause)))[rows]]
+
+def find_minimum_partitions_batch(lattice: MarginalizationLattice, rows: np.ndarray, original: np.ndarray, partitions, budget: SearchBudget = None):
+    """
+    Search the minimum partition of several states of the same system at once, walking the partitions a single time.
+
+    For every partition, the factors of all the states still searching are gathered with one row selection per side
+    of the partition from the shared marginalizations, and the bounds of `find_minimum_partition` and the joint
+    distributions are computed for all of them together. Only the exact EMD is calculated state by state. Each state
+    keeps the first partition with its minimum distance and stops searching once it finds a distance of 0.
+
+    Args:
+        lattice (MarginalizationLattice): The marginalizations of the TPM.
+        rows (np.ndarray): The row of the TPM of every state.
+        original (np.ndarray): The original distribution of every state, one per row.
+        partitions (iterable): The partitions to evaluate.
+        budget (SearchBudget): Time or evaluation budget shared by all the states.
+
+    Returns:
+        tuple: The minimum distance, distribution and partition of every state, the evaluated, pruned and visited
+        counters of every state, and whether the budget was exhausted.
+    """
+    states = len(rows)
+    effects = lattice.matrix.shape[1] // 2
+
+    original_marginals = original @ bit_table(effects)
+    original_mass = original.sum(axis=1)
+
+    min_distance = np.full(states, float("inf"))
+    min_distribution = [None] * states
+    min_partition = [None] * states
+    evaluated = np.zeros(states, dtype=int)
+    pruned = np.zeros(states, dtype=int)
+    visited = np.zeros(states, dtype=int)
+    interrupted = False
+
+    for partition in partitions:
+        active = np.flatnonzero(min_distance > 0.0)
+        if len(active) == 0:
+            break
+
+        if budget is not None and budget.exhausted():
+            interrupted = True
+            break
+
+        a, b, negative_a, negative_b = partition
+        visited[active] += 1
+
+        in_a = np.repeat(np.isin(np.arange(effects), a), 2)
+        factors = np.where(in_a, state_factors(lattice, b, rows[active]), state_factors(lattice, negative_b, rows[active]))
+        bounded = np.abs(np.prod(factors[:, 0::2] + factors[:, 1::2], axis=1) - original_mass[active]) < MASS_TOLERANCE
+
+        bound = np.abs(original_marginals[active] - factors[:, 1::2]).sum(axis=1)
+        keep = ~(bounded & (bound >= min_distance[active]))
+        pruned[active[~keep]] += 1
+        active, factors, bounded = active[keep], factors[keep], bounded[keep]
+
+        if len(active) == 0:
+            continue
+
+        joints = product_tensor(factors)
+
+        bound = np.abs(original[active] - joints).sum(axis=1) / 2
+        keep = ~(bounded & (bound >= min_distance[active]))
+        pruned[active[~keep]] += 1
+
+        for state, joint in zip(active[keep], joints[keep]):
+            distance = abs(get_emd(original[state], joint))
+            evaluated[state] += 1
+            if budget is not None:
+                budget.spend()
+
+            if distance < min_distance[state]:
+                min_distance[state] = distance
+                min_distribution[state] = joint
+                min_partition[state] = partition
+
+    return min_distance, min_distribution, min_partition, (evaluated, pruned, visited), interrupted
+
+def calculate_minimum_partitions(full_system: np.ndarray, binary_distributions: list, budget: SearchBudget = None) -> list:
+    """
+    Calculate the minimum partition of a system for several binary distributions (states) of the same TPM.
+    The marginalizations are calculated once for all the states, see `find_minimum_partitions_batch`.
+
+    Args:
+        full_system (np.ndarray): The TPM of the system.
+        binary_distributions (list): The binary distributions of the states.
+        budget (SearchBudget): Time or evaluation budget shared by all the states.
+
+    Returns:
+        list[MinimumPartitionResponse]: The minimum partition of every state, in the same order.
+    """
+    system_shape_rows, system_shape_columns = full_system.shape
+
+    lattice = MarginalizationLattice(full_system, cache=marginalization_cache)
+    base_effect = tuple(range(round(system_shape_columns/2)))
+    base_cause = tuple(range(round(math.log2(system_shape_rows))))
+
+    rows = np.array([binary_to_index(binary_distribution) for binary_distribution in binary_distributions], dtype=np.intp)
+    original = product_tensor(full_system[rows]) if len(rows) > 0 else np.zeros((0, 2**len(base_effect)))
+
+    min_distance, min_distribution, min_partition, counters, interrupted = find_minimum_partitions_batch(
+        lattice, rows, original, gen_gray_partitions([base_effect, base_cause]), budget)
+
+    evaluated, pruned, visited = counters
+    total = count_gray_partitions([base_effect, base_cause])
+    responses = []
+
+    for state, binary_distribution in enumerate(binary_distributions):
+        res = MinimumPartitionResponse(binary_distribution=binary_distribution, partition=min_partition[state], distance=float(min_distance[state]))
+
+        res.stats["batch_size"] = len(binary_distributions)
+        res.stats["evaluated_partitions"] = int(evaluated[state])
+        res.stats["pruned_partitions"] = int(pruned[state])
+        res.stats.update(search_stats(
+            covered=int(visited[state]),
+            total=total,
+            interrupted=interrupted and min_distance[state] > 0.0,
+            proven_optimal=not interrupted or min_distance[state] == 0.0,
+        ))
+        res.stats["marginalizations"] = lattice.stats()
+
+        res.original_distribution = original[state].tolist()
+        if min_distribution[state] is not None:
+            res.min_cut_distribution = min_distribution[state].tolist()
+
+        responses.append(res)
+
+    return responses
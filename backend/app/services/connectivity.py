@@ -0,0 +1,90 @@
+from typing import List
+
+class DisjointSet:
+    """
+    Union-find over the integers [0, size) with path halving and union by size.
+    """
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+        self.components = size
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+
+        return x
+
+    def union(self, x: int, y: int) -> bool:
+        x, y = self.find(x), self.find(y)
+        if x == y:
+            return False
+
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        self.components -= 1
+
+        return True
+
+    def groups(self) -> List[List[int]]:
+        """
+        Elements of every set, sets ordered by their first element and elements in increasing order.
+        """
+        groups = {}
+        for x in range(len(self.parent)):
+            groups.setdefault(self.find(x), []).append(x)
+
+        return list(groups.values())
+
+def find_bridges(nodes_count: int, edges) -> list:
+    """
+    Whether each edge is a bridge of the undirected multigraph given by `edges`, (u, v) pairs of nodes in [0, nodes_count):
+    an edge whose removal increases the number of connected components. Iterative Tarjan, O(V + E).
+    """
+    adjacency = [[] for _ in range(nodes_count)]
+    for k, (u, v) in enumerate(edges):
+        adjacency[u].append((v, k))
+        adjacency[v].append((u, k))
+
+    order = [-1] * nodes_count
+    low = [0] * nodes_count
+    bridges = [False] * len(edges)
+    counter = 0
+
+    for root in range(nodes_count):
+        if order[root] != -1:
+            continue
+
+        order[root] = low[root] = counter
+        counter += 1
+        stack = [(root, -1, iter(adjacency[root]))]
+
+        while stack:
+            node, parent_edge, neighbors = stack[-1]
+
+            for neighbor, k in neighbors:
+                if k == parent_edge:
+                    continue
+
+                if order[neighbor] == -1:
+                    order[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append((neighbor, k, iter(adjacency[neighbor])))
+                    break
+
+                low[node] = min(low[node], order[neighbor])
+            else:
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                    if low[node] > order[parent]:
+                        bridges[parent_edge] = True
+
+    return bridges
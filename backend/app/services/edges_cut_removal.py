@@ -3,156 +3,294 @@ from app.services.matching import CheckBipartite
 from app.schemas.graphs import GraphSchema
 from app.schemas.generation import GenGraphInput
 from app.services.gen_graph import GenerateGraph, TransformToGraphSchema, generateNodeLabels
-from .matrix import get_binary_position, product_tensor, recursive_marginalization, expand_matrix, get_emd
+from .matrix import get_binary_position, product_tensor, product_tensor_row, expand_matrix, get_emd
+from .marginalization_lattice import MarginalizationLattice
+from .marginalization_cache import marginalization_cache
 from .compare_partitions import MinimumPartitionResponse
+from .memo import Memo
+from .bit_index import binary_to_index
+from .search_budget import SearchBudget, search_stats
+from .connectivity import DisjointSet, find_bridges
+from .min_cut import CUT_METHODS, cut_weights
 
 
 class EdgeRemovalResult:
-    new_matrix = None
-    expanded_matrix = None
+    """
+    Result of removing edges towards an effect. The modified matrix is only built when `new_matrix` or
+    `expanded_matrix` are accessed, which is needed only when the removal is kept.
+    """
     vector_resultant = None
     cost = None
     connected_components = None
 
-    def __init__(self, new_matrix, expanded_matrix, vector_resultant):
-        self.new_matrix: np.ndarray = new_matrix
-        self.expanded_matrix: np.ndarray = expanded_matrix
+    def __init__(self, vector_resultant, build_matrix):
         self.vector_resultant: np.ndarray = vector_resultant
+        self._build_matrix = build_matrix
+        self._matrices = None
+
+    def _get_matrices(self):
+        if self._matrices is None:
+            self._matrices = self._build_matrix()
+
+        return self._matrices
+
+    @property
+    def new_matrix(self) -> np.ndarray:
+        return self._get_matrices()[0]
+
+    @property
+    def expanded_matrix(self) -> np.ndarray:
+        return self._get_matrices()[1]
 
 class MinCut:
         cost = float('inf')
         connected_components = None
         graph = None
         partition = None
+        evaluated_edges = 0
+        evaluated_mask = None
+        total_edges = 0
+        interrupted = False
+
+def remove_present_from_effect(p_matrix: np.ndarray, effect: int, target_cause: tuple, base_cause: tuple, lattice: MarginalizationLattice = None, view: bool = False):
+    if lattice is None:
+        lattice = MarginalizationLattice(p_matrix)
 
-def remove_present_from_effect(p_matrix: np.ndarray, effect: int, target_cause: tuple, base_cause: tuple):
     base_cause_set = set(base_cause)
     diff_target_cause = list(base_cause_set.difference(target_cause))
     diff_target_cause.sort()
 
     effect_columns = [effect*2, (effect*2)+1]
 
-    effect_marginalized = recursive_marginalization(
-        matrix=p_matrix[:, effect_columns],
-        tensors=len(base_cause),
-        positions=diff_target_cause,
-        axis=1,
-    )
+    effect_marginalized = lattice.get(target_cause)[:, effect_columns]
 
     expanded_matrix = expand_matrix(
         matrix=effect_marginalized,
         tensors=len(base_cause)-len(diff_target_cause),
         positions=diff_target_cause,
-        axis=0
+        axis=0,
+        view=view,
     )
 
     return expanded_matrix
 
-def get_probability_distribution_with_new_effect(p_matrix: np.ndarray, binary_distribution: str, effect: int, target_cause: tuple, base_cause: tuple):
-    expanded_matrix = remove_present_from_effect(p_matrix, effect, target_cause, base_cause)
+def get_effect_factor(binary_distribution: str, effect: int, target_cause: tuple, lattice: MarginalizationLattice, memo: Memo = None):
+    """
+    Distribution of a single effect given only the target cause, at the state of the binary distribution.
+    """
+    factor = memo.get((effect,), target_cause, scope="MG") if memo is not None else None
 
-    new_matrix = p_matrix.copy()
-    effect_columns = [effect*2, (effect*2)+1]
+    if factor is None:
+        row_index = binary_to_index(binary_distribution, mask=target_cause)
+        factor = lattice.get(target_cause)[row_index, effect*2:(effect*2)+2]
 
-    row_index = get_binary_position(binary=binary_distribution)
-    new_matrix[:, effect_columns] = expanded_matrix
+        if memo is not None:
+            memo.add((effect,), target_cause, factor, scope="MG")
 
-    return EdgeRemovalResult(
-        new_matrix=new_matrix,
-        expanded_matrix=expanded_matrix,
-        vector_resultant=product_tensor(matrix=new_matrix, row=row_index)
-    )
+    return factor
 
-def evaluate_edge_removal(g: GraphSchema, labels: dict, p_matrix: np.ndarray, original_vector: np.ndarray, binary_distribution: str, effect: int, target_cause: tuple, base_effect: tuple, base_cause: tuple):
-    base_cause_set = set(base_cause)
-    causes_to_remove = list(base_cause_set.difference(target_cause))
-    causes_to_remove.sort()
+def get_untouched_distribution(p_matrix: np.ndarray, binary_distribution: str, effect: int, base_cause: tuple, memo: Memo = None):
+    """
+    Distribution of every effect but the given one at the state of the binary distribution, as a tensor with one axis per effect
+    where the axis of the given effect has length 1. It is shared by the removals of all the edges towards that effect.
+    """
+    effects = p_matrix.shape[1] // 2
+    others = tuple(k for k in range(effects) if k != effect)
+
+    untouched = memo.get(others, base_cause) if memo is not None else None
+
+    if untouched is None:
+        row = p_matrix[get_binary_position(binary=binary_distribution)]
+        untouched = product_tensor_row(np.concatenate([row[:effect*2], row[(effect*2)+2:]]))
+
+        if memo is not None:
+            memo.add(others, base_cause, untouched)
 
+    return untouched.reshape((2,) * (effects - 1 - effect) + (1,) + (2,) * effect)
+
+def get_probability_distribution_with_new_effect(p_matrix: np.ndarray, binary_distribution: str, effect: int, target_cause: tuple, base_cause: tuple, lattice: MarginalizationLattice = None, memo: Memo = None):
+    """
+    Distribution of the system at the state of the binary distribution when the effect only depends on the target cause.
+    The distribution of the untouched effects is kept and only the factor of the effect is swapped in.
+    """
+    if lattice is None:
+        lattice = MarginalizationLattice(p_matrix)
+
+    effects = p_matrix.shape[1] // 2
+    effect_columns = slice(effect*2, (effect*2)+2)
+
+    untouched = get_untouched_distribution(p_matrix, binary_distribution, effect, base_cause, memo)
+    factor = get_effect_factor(binary_distribution, effect, target_cause, lattice, memo)
+    vector_resultant = (untouched * factor.reshape((1,) * (effects - 1 - effect) + (2,) + (1,) * effect)).reshape(1, -1)
+
+    def build_matrix():
+        expanded_tensor = remove_present_from_effect(p_matrix, effect, target_cause, base_cause, lattice, view=True)
+
+        new_matrix = p_matrix.copy()
+        new_matrix.reshape(expanded_tensor.shape[:-1] + (-1,))[..., effect_columns] = expanded_tensor
+
+        return new_matrix, new_matrix[:, effect_columns]
+
+    return EdgeRemovalResult(vector_resultant=vector_resultant, build_matrix=build_matrix)
+
+def evaluate_edge_removal(p_matrix: np.ndarray, original_vector: np.ndarray, binary_distribution: str, effect: int, target_cause: tuple, base_cause: tuple, lattice: MarginalizationLattice = None, memo: Memo = None):
     removal_result = get_probability_distribution_with_new_effect(
         p_matrix=p_matrix,
         binary_distribution=binary_distribution,
         effect=effect,
         target_cause=target_cause,
-        base_cause=base_cause)
-
-    distance = get_emd(original_vector[0], removal_result.vector_resultant[0])
-    removal_result.cost = distance
+        base_cause=base_cause,
+        lattice=lattice,
+        memo=memo)
 
-    edges_to_restore = []
+    removal_result.cost = get_emd(original_vector[0], removal_result.vector_resultant[0])
 
-    for c in causes_to_remove:
-        from_node_id = labels["causes"][c]
-        to_node_id = labels["effects"][effect]
+    return removal_result
 
-        g.update_edge_weight(
-            from_node_id=from_node_id,
-            to_node_id=to_node_id,
-            new_weight=0.0,
-            color="#FF6B6B",
-            lineType="dashed"
+def get_edges_components(active_edges: np.ndarray, removed_edges=()) -> list:
+    """
+    Connected components of the bipartite graph of the system, causes are the nodes [0, causes) and effects the nodes
+    [causes, causes + effects).
+
+    params:
+        active_edges: boolean causes x effects array of the edges in the graph
+        removed_edges: (cause, effect) pairs of active edges to leave out
+    """
+    causes_count, effects_count = active_edges.shape
+    removed_edges = set(removed_edges)
+    components = DisjointSet(causes_count + effects_count)
+
+    for cause, effect in zip(*np.nonzero(active_edges)):
+        if (cause, effect) not in removed_edges:
+            components.union(int(cause), causes_count + int(effect))
+
+    return components.groups()
+
+def get_edges_bridges(active_edges: np.ndarray) -> tuple:
+    """
+    Number of connected components of the bipartite graph of the system and its bridges, the active edges whose
+    removal splits a component in two.
+
+    params:
+        active_edges: boolean causes x effects array of the edges in the graph
+
+    returns:
+        the number of components and the set of (cause, effect) pairs of the bridges
+    """
+    causes_count, effects_count = active_edges.shape
+    edges = [(int(cause), int(effect)) for cause, effect in zip(*np.nonzero(active_edges))]
+    components = DisjointSet(causes_count + effects_count)
+
+    for cause, effect in edges:
+        components.union(cause, causes_count + effect)
+
+    is_bridge = find_bridges(causes_count + effects_count, [(cause, causes_count + effect) for cause, effect in edges])
+
+    return components.components, {edge for edge, bridge in zip(edges, is_bridge) if bridge}
+
+def get_node_labels(presentNodesCount: int, futureNodesCount: int) -> list:
+    """
+    Labels of the nodes of the bipartite graph of the system, in the order of `get_edges_components`.
+    """
+    return generateNodeLabels(presentNodesCount) + [l + "'" for l in generateNodeLabels(futureNodesCount)]
+
+def build_edges_graph(costs: np.ndarray, evaluated_edges: np.ndarray) -> GraphSchema:
+    """
+    Bipartite graph of the system weighted with the cost of removing each evaluated edge, the removed edges have weight zero.
+    """
+    presentNodesCount, futureNodesCount = costs.shape
+    labels = get_node_labels(presentNodesCount, futureNodesCount)
+
+    g = TransformToGraphSchema(
+        GenerateGraph(
+          GenGraphInput(
+            nodesNumber=presentNodesCount+futureNodesCount,
+            isBipartite=True,
+            presentNodesCount=presentNodesCount,
+            futureNodesCount=futureNodesCount,
+          )
         )
+    )
 
-        edges_to_restore.append((from_node_id, to_node_id))
+    for cause, effect in zip(*np.nonzero(evaluated_edges)):
+        cost = costs[cause, effect]
+        from_node_id, to_node_id = labels[cause], labels[presentNodesCount + effect]
+
+        if cost == 0:
+            g.update_edge_weight(from_node_id=from_node_id, to_node_id=to_node_id, new_weight=0.0, color="#FF6B6B", lineType="dashed")
+        else:
+            g.update_edge_weight(from_node_id=from_node_id, to_node_id=to_node_id, new_weight=float(cost))
 
     bip = CheckBipartite(g=g)
     bip.exclude_zero_weights = True
-    check_bipartite_res = bip.process()
-
-    removal_result.connected_components = check_bipartite_res.connectedComponents
+    bip.process() # color the nodes of the resulting graph
 
-    if removal_result.cost == 0.0:
-        return removal_result
+    return g
 
-    for from_node, to_node in edges_to_restore:
-        g.update_edge_weight(
-            from_node_id=from_node,
-            to_node_id=to_node,
-            new_weight=removal_result.cost
-        )
+def calculate_edges_costs(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: int, futureNodesCount: int, base_effect: tuple, base_cause: tuple, lattice: MarginalizationLattice = None, memo: Memo = None, budget: SearchBudget = None):
+    """
+    Cost of removing every cause -> effect edge of the system, on integer node indices. Edges whose removal costs
+    zero are removed for good before evaluating the next ones, and only then the bridges of the graph are recomputed.
+    The graph for the response is only built at the end.
+    """
+    if lattice is None:
+        lattice = MarginalizationLattice(p_matrix)
 
-    return removal_result
+    if memo is None:
+        memo = Memo(binary_distribution=binary_distribution)
 
-def calculate_edges_costs(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: int, futureNodesCount: int, base_effect: tuple, base_cause: tuple, g: GraphSchema):
     original_distribution = product_tensor(p_matrix, row=get_binary_position(binary=binary_distribution))
-
-    cause_labels = generateNodeLabels(presentNodesCount)
-    effect_labels = generateNodeLabels(futureNodesCount)
-    labels = {
-      "effects": {i: l+"'" for i, l in enumerate(effect_labels) },
-      "causes": {i: l for i, l in enumerate(cause_labels) }
-    }
-
-    anti_labels = {
-      "effects": {l+"'": i for i, l in enumerate(effect_labels) },
-      "causes": {l: i for i, l in enumerate(cause_labels) }
-    }
+    labels = get_node_labels(presentNodesCount, futureNodesCount)
 
     p_m = p_matrix.copy()
     adjayency_matrix = np.zeros((presentNodesCount, futureNodesCount))
+    active_edges = np.ones((presentNodesCount, futureNodesCount), dtype=bool)
+    evaluated_edges = np.zeros((presentNodesCount, futureNodesCount), dtype=bool)
 
     min_cut: MinCut = MinCut()
+    min_cut.total_edges = presentNodesCount * futureNodesCount
+    components_count, bridges = get_edges_bridges(active_edges)
 
     for effect in range(futureNodesCount):
-        subscriptors = g.get_nodes_pointing_to(labels["effects"][effect])
-        subscriptors.sort(key=lambda n: n.label)
+        for cause in range(presentNodesCount):
+            if budget is not None and budget.exhausted():
+                min_cut.interrupted = True
+                break
 
-        for sub in subscriptors:
-            cause_node_int = anti_labels["causes"][sub.label]
-            target_cause = tuple(i for i in range(3) if i != cause_node_int)
+            target_cause = tuple(c for c in base_cause if c != cause)
 
-            res = evaluate_edge_removal(g, labels, p_m, original_distribution, binary_distribution, effect, target_cause, base_effect, base_cause)
+            res = evaluate_edge_removal(p_m, original_distribution, binary_distribution, effect, target_cause, base_cause, lattice, memo)
+            evaluated_edges[cause, effect] = True
+            min_cut.evaluated_edges += 1
+            if budget is not None:
+                budget.spend()
 
             if res.cost == 0:
                 p_m = res.new_matrix # replace the matrix with the modified matrix if the cost is 0
+                lattice.replace_columns([effect*2, (effect*2)+1], res.expanded_matrix)
+                memo.invalidate(effect)
+                active_edges[cause, effect] = False
+                components_count, bridges = get_edges_bridges(active_edges)
             else:
-                adjayency_matrix[cause_node_int, effect] = res.cost
+                adjayency_matrix[cause, effect] = res.cost
 
-            if len(res.connected_components) == 2 and res.cost < min_cut.cost:
+            if res.cost >= min_cut.cost:
+                continue
+
+            if components_count + ((cause, effect) in bridges) == 2:
+                components = get_edges_components(active_edges, removed_edges=[(cause, effect)])
                 min_cut.cost = res.cost
-                min_cut.connected_components = res.connected_components
+                min_cut.connected_components = {
+                    group: [labels[node] for node in nodes]
+                    for group, nodes in enumerate(components, start=1)
+                }
                 # TODO: find min_cut.partition
 
-    min_cut.graph = g
+        if min_cut.interrupted:
+            break
+
+    min_cut.evaluated_mask = evaluated_edges
+    min_cut.graph = build_edges_graph(adjayency_matrix, evaluated_edges)
 
     return [min_cut, adjayency_matrix]
 
@@ -198,23 +336,44 @@ def walk_heatmap_desc(adj_matrix: np.ndarray):
 
     return min_cut
 
-def calculate_edges_cut(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: int, futureNodesCount: int, base_effect: tuple, base_cause: tuple):
+def solve_cost_matrix_cut(adj_matrix: np.ndarray, method: str = "stoer_wagner") -> MinCut:
+    """
+    Minimum bipartition of the causes x effects cost matrix. The partition is [effects, causes] of the smaller side.
+
+    params:
+        adj_matrix: cost of removing every cause -> effect edge
+        method: "stoer_wagner" for the exact minimum cut, "spectral" for a spectral sweep refined with single node moves,
+            or "heatmap" for the greedy `walk_heatmap_desc`
+    """
+    if method == "heatmap":
+        return walk_heatmap_desc(adj_matrix=adj_matrix)
+
+    if method not in CUT_METHODS:
+        raise ValueError(f"Unknown cut method: {method}")
+
+    causes_count = adj_matrix.shape[0]
+    cost, side = CUT_METHODS[method](cut_weights(adj_matrix))
+
+    if side.sum() * 2 > len(side):
+        side = ~side
+
+    nodes = np.flatnonzero(side).tolist()
+
+    min_cut = MinCut()
+    min_cut.cost = cost
+    min_cut.partition = [[v - causes_count for v in nodes if v >= causes_count], [v for v in nodes if v < causes_count]]
+
+    return min_cut
+
+def calculate_edges_cut(p_matrix: np.ndarray, binary_distribution: str, presentNodesCount: int, futureNodesCount: int, base_effect: tuple, base_cause: tuple, budget: SearchBudget = None, cut_method: str = "stoer_wagner"):
     p_matrix = np.array(p_matrix)
 
     response = MinimumPartitionResponse(
         binary_distribution=binary_distribution,
     )
 
-    g_dict = GenerateGraph(
-      GenGraphInput(
-        nodesNumber=presentNodesCount+futureNodesCount,
-        isBipartite=True,
-        presentNodesCount=presentNodesCount,
-        futureNodesCount=futureNodesCount,
-      )
-    )
-
-    g = TransformToGraphSchema(g_dict)
+    lattice = MarginalizationLattice(p_matrix, cache=marginalization_cache)
+    memo = Memo(binary_distribution=binary_distribution)
 
     min_cut, adjayency_matrix = calculate_edges_costs(
         p_matrix=p_matrix,
@@ -223,10 +382,21 @@ def calculate_edges_cut(p_matrix: np.ndarray, binary_distribution: str, presentN
         futureNodesCount=futureNodesCount,
         base_effect=base_effect,
         base_cause=base_cause,
-        g=g
+        lattice=lattice,
+        memo=memo,
+        budget=budget,
     )
 
-    response.graph = g.model_dump()
+    response.graph = min_cut.graph.model_dump()
+    response.stats.update(search_stats(
+        covered=min_cut.evaluated_edges,
+        total=min_cut.total_edges,
+        interrupted=min_cut.interrupted,
+        proven_optimal=min_cut.cost == 0.0,
+    ))
+    response.stats["memo"] = memo.stats()
+    response.stats["marginalizations"] = lattice.stats()
+    response.stats["marginalization_cache"] = marginalization_cache.stats()
 
     if min_cut.cost < float('inf'):
         response.distance = min_cut.cost
@@ -234,9 +404,18 @@ def calculate_edges_cut(p_matrix: np.ndarray, binary_distribution: str, presentN
 
         return response
 
+    if min_cut.interrupted:
+        # The edges left without cost would be free edges for the cut solver, so no cut is reported
+        response.stats["edges_costs"] = [
+            [float(cost) if evaluated else None for cost, evaluated in zip(costs, mask)]
+            for costs, mask in zip(adjayency_matrix, min_cut.evaluated_mask)
+        ]
+
+        return response
 
-    wal_res = walk_heatmap_desc(adj_matrix=adjayency_matrix)
-    response.distance = int(wal_res.cost)
-    response.partition = wal_res.partition
+    cut = solve_cost_matrix_cut(adj_matrix=adjayency_matrix, method=cut_method)
+    response.distance = int(cut.cost) if cut_method == "heatmap" else float(cut.cost)
+    response.partition = cut.partition
+    response.stats["cut_method"] = cut_method
 
     return response
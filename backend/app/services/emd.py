@@ -0,0 +1,240 @@
+import numpy as np
+from .bit_index import bit_table
+
+FLOW_TOLERANCE = 1e-12
+PRODUCT_TOLERANCE = 1e-12
+
+def hypercube_emd(a: np.ndarray, b: np.ndarray, tol: float = FLOW_TOLERANCE) -> float:
+    """
+    Exact Earth Mover's Distance between two distributions over the states of n binary nodes,
+    using the Hamming distance between states as ground distance.
+
+    When both distributions have the same mass and are products of independent nodes, as the joint
+    distributions of the systems are, the EMD is the L1 distance of their node marginals times the mass:
+    it is a lower bound (see `marginal_lower_bound`) reached by moving every node independently.
+    This takes O(n*2^n); any other pair of distributions goes through `min_cost_flow_emd`.
+
+    Args:
+        a (np.ndarray): Source distribution, little endian ordered, of length 2^n.
+        b (np.ndarray): Target distribution, little endian ordered, of length 2^n.
+        tol (float): Amounts of mass below this value are considered zero.
+
+    Returns:
+        float: The minimum cost to transport `a` into `b`.
+    """
+    a, b = _pad_to_hypercube(a, b)
+    mass = a.sum()
+
+    if abs(mass - b.sum()) <= tol and mass > tol:
+        a_marginals = product_marginals(a)
+        if a_marginals is not None:
+            b_marginals = product_marginals(b)
+            if b_marginals is not None:
+                return float(mass * np.abs(a_marginals - b_marginals).sum())
+
+    return min_cost_flow_emd(a, b, tol)
+
+def _pad_to_hypercube(a: np.ndarray, b: np.ndarray):
+    a = np.asarray(a, dtype=float).ravel()
+    b = np.asarray(b, dtype=float).ravel()
+
+    size = max(len(a), len(b))
+    size = 1 << max(size - 1, 1).bit_length()
+    if len(a) < size:
+        a = np.pad(a, (0, size - len(a)))
+    if len(b) < size:
+        b = np.pad(b, (0, size - len(b)))
+
+    return a, b
+
+def product_marginals(distribution: np.ndarray, rtol: float = PRODUCT_TOLERANCE):
+    """
+    Probability of every node being 1 when a little endian distribution over the states of n binary nodes
+    is the product of its node marginals, up to `rtol` relative to every state, None otherwise.
+    """
+    mass = distribution.sum()
+    n = (len(distribution) - 1).bit_length()
+    marginals = np.array([distribution.reshape(-1, 2, 1 << i)[:, 1].sum() for i in range(n)]) / mass
+
+    product = np.full(1, mass)
+    for m in marginals:
+        product = np.concatenate([product * (1 - m), product * m])
+
+    if not np.all(np.abs(distribution - product) <= rtol * np.abs(product)):
+        return None
+
+    return marginals
+
+def min_cost_flow_emd(a: np.ndarray, b: np.ndarray, tol: float = FLOW_TOLERANCE) -> float:
+    """
+    Exact hypercube EMD between any two distributions, see `hypercube_emd`.
+
+    The Hamming distance is the shortest-path metric of the hypercube {0,1}^n, so the transport
+    problem is solved as an uncapacitated min-cost flow over the n*2^n hypercube edges instead of
+    over the 4^n pairs of states. The flow is stored as an array F[state, bit] holding the net
+    flow from `state` to `state ^ (1 << bit)` and is built with successive shortest paths:
+    every round runs a bucketed Dijkstra (reduced costs are small integers) from the nodes with
+    remaining excess, and pushes flow through the whole shortest-path forest at once.
+
+    When both distributions don't carry the same mass only the smallest of both is moved, as the
+    previous greedy implementation did.
+    """
+    a, b = _pad_to_hypercube(a, b)
+    size = len(a)
+    n = max(size - 1, 1).bit_length()
+
+    diff = a - b
+    excess = np.where(diff > tol, diff, 0.0)
+    deficit = np.where(diff < -tol, -diff, 0.0)
+
+    flow = np.zeros((size, n))
+    potential = np.zeros(size)
+    bits = 1 << np.arange(n)
+
+    while excess.sum() > tol and deficit.sum() > tol:
+        forest = _shortest_path_forest(flow, potential, excess, deficit, bits, tol)
+        if forest is None:
+            break
+
+        _augment_forest(flow, excess, deficit, bits, tol, *forest)
+
+        excess[excess < tol] = 0.0
+        deficit[deficit < tol] = 0.0
+
+    return float(np.abs(flow).sum() / 2)
+
+def _shortest_path_forest(flow, potential, excess, deficit, bits, tol):
+    """
+    Bucketed Dijkstra over the residual hypercube, starting from every node with excess and
+    stopping at the first bucket that settles a node with deficit.
+    Moving along `bit` costs -1 while it cancels flow that came the other way and +1 otherwise.
+    The potentials are updated so every arc of the returned forest has reduced cost 0.
+
+    Returns:
+        tuple | None: (settled mask, parent bit per node, targets mask) or None if no deficit is reachable.
+    """
+    size, n = flow.shape
+    distance = np.where(excess > 0, 0.0, np.inf)
+    settled = np.zeros(size, dtype=bool)
+    parent_bit = np.full(size, -1)
+    arc_bits = np.broadcast_to(np.arange(n), (size, n))
+    bucket = 0.0
+
+    while True:
+        frontier = np.flatnonzero((distance == bucket) & ~settled)
+
+        while frontier.size:
+            settled[frontier] = True
+
+            neighbors = frontier[:, None] ^ bits
+            arc_cost = np.where(flow[frontier] < -tol, -1.0, 1.0)
+            candidate = bucket + arc_cost + potential[frontier][:, None] - potential[neighbors]
+
+            improves = (candidate < distance[neighbors]) & ~settled[neighbors]
+            if not improves.any():
+                break
+
+            reached = neighbors[improves]
+            reached_cost = candidate[improves]
+            np.minimum.at(distance, reached, reached_cost)
+
+            tight = reached_cost == distance[reached]
+            parent_bit[reached[tight]] = arc_bits[:frontier.size][improves][tight]
+            frontier = np.unique(reached[tight & (reached_cost == bucket)])
+
+        if (settled & (deficit > 0)).any():
+            break
+
+        pending = distance[~settled]
+        if pending.size == 0 or not np.isfinite(pending.min()):
+            return None
+
+        bucket = pending.min()
+
+    potential += np.minimum(distance, bucket)
+
+    return settled, parent_bit, settled & (deficit > 0)
+
+def _augment_forest(flow, excess, deficit, bits, tol, settled, parent_bit, targets):
+    """
+    Push as much flow as possible from the roots of the shortest-path forest to its targets.
+    The demand of every subtree is aggregated bottom-up, capped by the residual capacity of the
+    arcs, and the supply available at each root is split top-down proportionally to it.
+    """
+    size = flow.shape[0]
+
+    children = np.flatnonzero(settled & (parent_bit >= 0))
+    child_bits = parent_bit[children]
+    parents = children ^ bits[child_bits]
+
+    parent_of = np.full(size, -1)
+    parent_of[children] = parents
+
+    depth = np.zeros(size, dtype=int)
+    walk, ancestor = children, parents
+    while walk.size:
+        depth[walk] += 1
+        ancestor = parent_of[ancestor]
+        keep = ancestor >= 0
+        walk, ancestor = walk[keep], ancestor[keep]
+
+    order = np.argsort(depth[children], kind="stable")
+    children, child_bits, parents = children[order], child_bits[order], parents[order]
+
+    # flow[child, bit] > 0 means the arc parent -> child cancels flow, so it is bounded by it
+    backward = flow[children, child_bits]
+    capacity = np.where(backward > tol, backward, np.inf)
+
+    levels = depth[children]
+    max_depth = levels[-1] if levels.size else 0
+    bounds = np.searchsorted(levels, np.arange(1, max_depth + 2))
+
+    demand = np.where(targets, deficit, 0.0)
+    accepted = np.zeros(size)
+    for level in range(max_depth, 0, -1):
+        span = slice(bounds[level-1], bounds[level])
+        nodes = children[span]
+        accepted[nodes] = np.minimum(demand[nodes], capacity[span])
+        np.add.at(demand, parents[span], accepted[nodes])
+
+    roots = settled & (parent_bit < 0) & (excess > 0)
+    incoming = np.zeros(size)
+    incoming[roots] = np.minimum(excess[roots], demand[roots])
+    excess[roots] -= incoming[roots]
+
+    for level in range(1, max_depth + 1):
+        span = slice(bounds[level-1], bounds[level])
+        nodes = children[span]
+        parent_demand = demand[parents[span]]
+        share = np.divide(incoming[parents[span]], parent_demand, out=np.zeros(nodes.size), where=parent_demand > 0)
+        incoming[nodes] = accepted[nodes] * share
+
+    sinks = np.flatnonzero(targets)
+    share = np.divide(incoming[sinks], demand[sinks], out=np.zeros(sinks.size), where=demand[sinks] > 0)
+    deficit[sinks] -= np.minimum(deficit[sinks] * share, deficit[sinks])
+
+    flow[parents, child_bits] += incoming[children]
+    flow[children, child_bits] -= incoming[children]
+
+def node_marginals(distribution: np.ndarray) -> np.ndarray:
+    """
+    Probability of every node being 1 under a little endian distribution over the states of n binary nodes.
+    """
+    distribution = np.asarray(distribution, dtype=float).ravel()
+    n = (len(distribution) - 1).bit_length()
+
+    return distribution @ bit_table(n)
+
+def marginal_lower_bound(a_marginals: np.ndarray, b_marginals: np.ndarray) -> float:
+    """
+    Lower bound of the hypercube EMD between two distributions of the same mass given their node marginals.
+    Every unit of mass flipping a node costs at least 1, so each node needs to move at least the difference of its marginals.
+    """
+    return float(np.abs(np.asarray(a_marginals) - np.asarray(b_marginals)).sum())
+
+def total_variation(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Total variation distance, a lower bound of the hypercube EMD between two distributions of the same mass,
+    as all the mass that changes of state moves at least one step.
+    """
+    return float(np.abs(np.asarray(a, dtype=float).ravel() - np.asarray(b, dtype=float).ravel()).sum() / 2)
@@ -10,13 +10,24 @@ DEFAULT_WEIGHT_END = 1.0
 INFINITE_WEIGHT = float('inf')
 MATCHING_WEIGHT = -1
 
+def generateNodeLabel(index: int) -> str:
+    """
+    Generate the label of the node at the given index: 'A' to 'Z', then 'AA', 'AB' and so on, like spreadsheet columns.
+    """
+    label = ""
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(65 + remainder) + label  # 65 is the ASCII value for 'A'
+    return label
+
 def generateNodeLabels(numNodes: int) -> List[str]:
     """
     Generate a list of node labels from 'A' onwards for the given number of nodes.
     """
     labels = []
     for i in range(numNodes):
-        labels.append(chr(65 + i))  # 65 is the ASCII value for 'A'
+        labels.append(generateNodeLabel(i))
     return labels
 
 def generateBipartiteGraph(presentNodesCount: int, futureNodesCount: int) -> Dict[str, List[AdjacencyNode]]:
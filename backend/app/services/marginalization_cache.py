@@ -0,0 +1,44 @@
+import hashlib
+import numpy as np
+from .byte_cache import ByteBudgetCache
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def tpm_fingerprint(matrix: np.ndarray) -> str:
+    """
+    Content hash of a TPM, equal matrices get the same fingerprint no matter where they come from.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((matrix.shape, matrix.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(matrix).data)
+
+    return digest.hexdigest()
+
+class MarginalizationCache(ByteBudgetCache):
+    """
+    Process-wide LRU cache of marginalized TPMs shared between requests.
+
+    Entries are keyed by the fingerprint of the TPM and the (effect, cause) subset they keep, and are stored read only.
+    The least recently used entries are evicted once the stored arrays exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(max_bytes)
+
+    def get(self, fingerprint: str, effect: tuple, cause: tuple):
+        return self.lookup((fingerprint, tuple(effect), tuple(cause)))
+
+    def put(self, fingerprint: str, effect: tuple, cause: tuple, marginal: np.ndarray) -> np.ndarray:
+        """
+        Store a marginalized TPM and return the read only array kept by the cache.
+        """
+        if marginal.nbytes > self.max_bytes:
+            return marginal
+
+        if marginal.flags.writeable:
+            marginal = marginal.copy()
+            marginal.setflags(write=False)
+
+        return self.store((fingerprint, tuple(effect), tuple(cause)), marginal)
+
+marginalization_cache = MarginalizationCache()
@@ -0,0 +1,126 @@
+from typing import Dict
+from itertools import combinations
+import math
+import numpy as np
+from .matrix import marginalize
+from .marginalization_cache import MarginalizationCache, tpm_fingerprint
+
+class MarginalizationLattice:
+    """
+    Cache of the marginalizations of a TPM over every subset of its causes.
+
+    The subsets form a lattice ordered by inclusion: the marginal of a cause subset is derived from an
+    already computed superset with exactly one more cause, by removing that single axis. The full set of
+    causes is the TPM itself, so each marginal is calculated only once per lattice, either lazily on
+    `get` or eagerly with `build`.
+
+    All the effect columns are marginalized together, callers select the columns they need.
+
+    If a shared cache is given, marginals missing in the lattice are looked up there by the fingerprint of the
+    TPM before being derived, and the derived ones are stored back, so equal TPMs of later requests reuse them.
+    """
+
+    def __init__(self, matrix: np.ndarray, cache: MarginalizationCache = None):
+        self.matrix = matrix
+        self.tensors = round(math.log2(matrix.shape[0]))
+        self.full_cause = tuple(range(self.tensors))
+        self.full_effect = tuple(range(matrix.shape[1] // 2))
+        self.marginals: Dict[tuple, np.ndarray] = {self.full_cause: matrix}
+        self.cache = cache
+        self.fingerprint = tpm_fingerprint(matrix) if cache is not None else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, cause: tuple) -> np.ndarray:
+        """
+        Marginalization of the TPM keeping only the given causes, rows are the little endian states of those causes.
+        """
+        key = tuple(sorted(set(cause)))
+
+        marginal = self.marginals.get(key)
+        if marginal is not None:
+            self.hits += 1
+            return marginal
+
+        marginal = self._shared(key)
+        if marginal is not None:
+            self.shared_hits += 1
+            return marginal
+
+        self.misses += 1
+
+        return self._derive(key)
+
+    def build(self, min_size: int = 0):
+        """
+        Eagerly compute every subset of at least `min_size` causes, from the largest subsets to the smallest ones.
+        """
+        for size in range(self.tensors - 1, min_size - 1, -1):
+            for cause in combinations(self.full_cause, size):
+                if cause not in self.marginals and self._shared(cause) is None:
+                    self._derive(cause)
+
+    def replace_columns(self, columns: list, values: np.ndarray):
+        """
+        Replace some columns of the TPM and update them in every cached marginalization.
+        The modified TPM is no longer the one of the shared cache, so the lattice stops using it.
+        """
+        self.cache = None
+        self.fingerprint = None
+        self.matrix = self.matrix.copy()
+        self.matrix[:, columns] = values
+
+        for cause, marginal in self.marginals.items():
+            if cause == self.full_cause:
+                self.marginals[cause] = self.matrix
+                continue
+
+            removed = [c for c in self.full_cause if c not in cause]
+            marginal = marginal.copy()
+            marginal[:, columns] = marginalize(values, self.tensors, removed, axis=1)
+            marginal.setflags(write=False)
+            self.marginals[cause] = marginal
+
+    def stats(self) -> dict:
+        requests = self.hits + self.shared_hits + self.misses
+
+        return {
+            "size": len(self.marginals),
+            "bytes": sum(m.nbytes for c, m in self.marginals.items() if c != self.full_cause),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.shared_hits) / requests if requests > 0 else 0.0,
+        }
+
+    def _shared(self, cause: tuple):
+        if self.cache is None:
+            return None
+
+        marginal = self.cache.get(self.fingerprint, self.full_effect, cause)
+        if marginal is not None:
+            self.marginals[cause] = marginal
+
+        return marginal
+
+    def _derive(self, cause: tuple) -> np.ndarray:
+        missing = [c for c in self.full_cause if c not in cause]
+
+        parents = [(c, tuple(sorted(cause + (c,)))) for c in missing]
+        removed, parent = next(((c, p) for c, p in parents if p in self.marginals), parents[-1])
+
+        parent_marginal = self.marginals.get(parent)
+        if parent_marginal is None:
+            parent_marginal = self._shared(parent)
+        if parent_marginal is None:
+            parent_marginal = self._derive(parent)
+
+        marginal = marginalize(parent_marginal, len(parent), [parent.index(removed)], axis=1)
+        marginal.setflags(write=False)
+        self.marginals[cause] = marginal
+
+        if self.cache is not None:
+            self.cache.put(self.fingerprint, self.full_effect, cause, marginal)
+
+        return marginal
@@ -1,105 +1,56 @@
 import numpy as np
 import math
-
-def str_bin(number: int | float, size: int):
-    return f'{number:0{size}b}'
-
-def hamming_distance(a, b):
-    return bin(a^b).count('1')
+from functools import lru_cache
+from .emd import hypercube_emd
+from .bit_index import binary_to_index, kept_positions, compressed_indices
+from .marginalization_cache import MarginalizationCache, tpm_fingerprint
 
 def get_emd(_a, _b):
-    a = _a.copy()
-    b = _b.copy()
-
-    len_a = math.log2(len(a))
-    len_b = math.log2(len(b))
-    max_len = int(max(len_a, len_b))
-    le_keys = gen_little_endian_range(max_len)
-
-    total = 0
-    a_sorter = np.argsort(a)
-
-    while a[a_sorter[-1]] != 0:
-        dB = {
-            le_keys.index(str_bin(i, max_len)): e
-            for i, e in enumerate(b)
-            if e > 0
-        }
-
-        le_A_key: int = int(le_keys[a_sorter[-1]], 2)
-
-        all_b_keys = {
-            k: hamming_distance(k, le_A_key)
-            for k, v in dB.items()
-        }
-        if not all_b_keys:
-            break
-
-        minimum = min(all_b_keys, key=all_b_keys.get)
-        b_key = le_keys.index(str_bin(minimum, max_len))
-
-        restar = min(a[a_sorter[-1]], b[b_key])
-        a[a_sorter[-1]] -= restar
-        b[b_key] -= restar
-
-        total += restar * all_b_keys[minimum]
-
-        a_sorter = np.argsort(a)
-
-    return total
+    """
+    Earth Mover's Distance between two distributions using the Hamming distance as ground distance.
+    Solved exactly as a min-cost flow over the hypercube edges, see `emd.hypercube_emd`.
+    """
+    return hypercube_emd(_a, _b)
 
 def get_binary_position(binary: str, mask=None, unmask=None):
-    if mask is not None:
-        binary = "".join([binary[i] for i in range(len(binary)) if i in mask])
-        if binary == "":
-            return 0
-    elif unmask is not None:
-        binary = "".join([binary[i] for i in range(len(binary)) if i not in unmask])
-        if binary == "":
-            return 0
-
-    return int(binary[::-1], 2)
-
-def mask_binary(binary: str, mask = None, unmask = None):
-    if mask is not None:
-        return "".join([binary[i] for i in range(len(binary)) if i in mask])
-
-    if unmask is not None:
-        return "".join([binary[i] for i in range(len(binary)) if i not in unmask])
+    """
+    Row index of a little endian binary state, optionally keeping only the positions in mask or dropping the ones in unmask.
+    """
+    return binary_to_index(binary, mask=mask, unmask=unmask)
 
 def product_tensor(matrix: np.ndarray, row: int = None):
     """
     Do product tensor of a matrix.
-    """
-    m = matrix.shape[0]
-    n = matrix.shape[1]
-    components = int(n/2)
-    columns = 2**components
-
-    rows = m if row is None else 1
+    Every row holds the pair of columns [P(0), P(1)] of each effect, the joint distribution of the row
+    is built as a chained outer product of those pairs in little endian order (first effect is the lowest bit).
 
-    m_tensor = np.full((rows, columns), np.nan)
-    binary_values_j = {}
-
-    for i in range(m_tensor.shape[0]):
-        i_matrix = i
-        if row is not None:
-            i_matrix = row
+    params:
+    matrix: np.ndarray    -> matrix to do the product tensor
+    row: int              -> if given, only the product tensor of this row is calculated
+    """
+    if row is not None:
+        return product_tensor_row(matrix[row])[np.newaxis, :]
 
-        for j in range(m_tensor.shape[1]):
-            if j not in binary_values_j:
-                binary_values_j[j] = bin(j)[2:].zfill(components)
+    m, n = matrix.shape
+    components = int(n/2)
 
-            positions = [(2*(components-(x+1)) + int(y)) if x < components-1 else int(y) for x, y in enumerate(binary_values_j[j])]
+    m_tensor = np.ones((m, 1))
+    for k in range(components-1, -1, -1):
+        m_tensor = (m_tensor[:, :, np.newaxis] * matrix[:, [2*k, 2*k+1]][:, np.newaxis, :]).reshape(m, -1)
 
-            cell_product = 1
+    return m_tensor
 
-            for k in positions:
-                cell_product *= matrix[i_matrix][k]
+def product_tensor_row(vector: np.ndarray):
+    """
+    Product tensor of a single row of a matrix, returned as a vector of 2^(len(vector)/2) elements.
+    """
+    components = int(len(vector)/2)
 
-            m_tensor[i][j] = cell_product
+    v_tensor = np.ones(1)
+    for k in range(components-1, -1, -1):
+        v_tensor = np.multiply.outer(v_tensor, vector[2*k:2*k+2]).ravel()
 
-    return m_tensor
+    return v_tensor
 
 def product_tensor_with_cut(matrix: np.ndarray, row: int, cut: int, left_side_exp: list[int]):
     """
@@ -111,127 +62,119 @@ def product_tensor_with_cut(matrix: np.ndarray, row: int, cut: int, left_side_ex
     left_side_exp: int    -> exponent of the left side of the cut, this is used to calculate the position of  the resulting tensor
     """
     m, n = matrix.shape
-    columns = cut * (n - cut)
-
-    vector_tensor = np.full((1, columns), np.nan)
-    tensors = round(math.log2(columns))
 
     if m == 1:
         row = 0
 
-    for i in range(columns):
-        full_bin = bin(i)[2:].zfill(tensors)[::-1]
-        left_index = get_binary_position(full_bin, mask=left_side_exp)
-        right_index = get_binary_position(full_bin, unmask=left_side_exp)
+    left_indices, right_indices = cut_gather_indices(cut, tuple(left_side_exp), n)
+    vector = matrix[row]
+
+    return (vector[left_indices] * vector[right_indices])[np.newaxis, :]
+
+@lru_cache(maxsize=1024)
+def cut_gather_indices(cut: int, left_side_exp: tuple, size: int):
+    """
+    Columns of the left and right side of a cut matrix that form every element of its product tensor.
+
+    cut: int              -> column where the matrix is divided
+    left_side_exp: tuple  -> positions of the left side tensors in the resulting tensor
+    size: int             -> number of columns of the matrix
+    """
+    columns = cut * (size - cut)
+    tensors = round(math.log2(columns))
 
-        vector_tensor[0][i] = matrix[row][left_index] * matrix[row][cut+right_index]
+    left_indices = compressed_indices(tensors, kept_positions(tensors, mask=left_side_exp))
+    right_indices = cut + compressed_indices(tensors, kept_positions(tensors, unmask=left_side_exp))
+    right_indices.setflags(write=False)
 
-    return vector_tensor
+    return left_indices, right_indices
 
 def marginalize(matrix: np.ndarray, tensors: int, positions: list, axis: int):
     """
-    Marginalize a matrix along an axis removing the position element.
+    Marginalize a matrix along an axis removing the position elements.
+    The axis is reshaped as a binary tensor of shape (2,)*tensors and all the removed positions are averaged at once.
 
     params:
     matrix: np.ndarray    -> matrix to marginalize
     tensors: int          -> number of tensors
     position: List[int]   -> positions to remove
-    axis: int             -> 0: row, 1: column
+    axis: int             -> 1: rows are the tensors, 0: columns are the tensors
     """
     m, n = matrix.shape
+    positions = sorted(set(positions))
 
-    if axis == 1:
-        new_m = 2 ** (tensors-len(positions))
-        new_n = n
-    else:
-        new_m = m
-        new_n = 2 ** (tensors-len(positions))
-
-    new_matrix = np.full((new_m, new_n), np.nan)
-    sum_count = 2 ** len(positions)
-    top_limit = 0
-    step_size = math.inf
-
-    for x in positions:
-        x_exp = 2**x
-        top_limit += x_exp
-
-        if x_exp < step_size:
-            step_size = x_exp
-
-    walked_rows = 0
-    counter = 0
-    bottom = 0
-
-    max_size = m if axis == 1 else n
-    iterator = {x for x in range(max_size)}
+    if len(positions) == 0:
+        return matrix.copy()
 
-    while walked_rows < max_size:
-        bottom = min(iterator)
-        top = bottom+top_limit
-        rows_to_sum = []
+    # in C order the first axis of the binary tensor is the most significant bit
+    removed_axes = tuple(tensors - 1 - p for p in positions)
 
-        for _ in range(round(sum_count/2)):
-            iterator.remove(bottom)
-            iterator.remove(top)
-            rows_to_sum.append(bottom)
-            rows_to_sum.append(top)
-
-            walked_rows += 2
-            bottom += step_size
-            top -= step_size
-
-        if axis == 1:
-            new_matrix[counter , :] = matrix[rows_to_sum , :].sum(axis=0) / 2
-        else:
-            new_matrix[: , counter] = matrix[: , rows_to_sum].sum(axis=1) / 2
-
-        counter += 1
+    if axis == 1:
+        tensor = matrix.reshape((2,) * tensors + (n,))
+        return tensor.mean(axis=removed_axes).reshape(-1, n)
 
-    return new_matrix
+    tensor = matrix.reshape((m,) + (2,) * tensors)
+    return tensor.mean(axis=tuple(1 + a for a in removed_axes)).reshape(m, -1)
 
 def recursive_marginalization(matrix: np.ndarray, tensors: int, positions: list, axis: int):
-    left, *rights = positions
+    return marginalize(matrix=matrix, tensors=tensors, positions=positions, axis=axis)
 
-    matrix = marginalize(matrix=matrix, tensors=tensors, positions=[left], axis=axis)
-    # TODO: add memoization
+def expand_matrix(matrix: np.ndarray, tensors: int, positions: list, axis: int = 0, view: bool = False):
+    """
+    Expand a matrix along an axis inserting the given positions as tensors which don't change the values.
+    The axis is reshaped as a binary tensor with the inserted positions as axes of size 1, then broadcasted.
 
-    if rights is None or len(rights) == 0:
-        return matrix
+    params:
+    matrix: np.ndarray    -> matrix to expand
+    tensors: int          -> number of tensors of the matrix
+    positions: List[int]  -> positions of the tensors to insert
+    axis: int             -> 0: row, 1: column
+    view: bool            -> return a read-only broadcast view with the expanded axis as a (2,)*n binary tensor instead of a new matrix
+    """
+    m, n = matrix.shape
+    full_tensors = tensors + len(positions)
+    inserted = set(positions)
 
-    decreased_rights = [x-1 for x in rights]
+    # in C order the first axis of the binary tensor is the most significant bit
+    binary_shape = tuple(1 if p in inserted else 2 for p in range(full_tensors-1, -1, -1))
+    full_shape = (2,) * full_tensors
 
-    return recursive_marginalization(matrix=matrix, tensors=tensors-1, positions=decreased_rights, axis=axis)
+    if axis == 0:
+        tensor = np.broadcast_to(matrix.reshape(binary_shape + (n,)), full_shape + (n,))
+    else:
+        tensor = np.broadcast_to(matrix.reshape((m,) + binary_shape), (m,) + full_shape)
 
-def gen_little_endian_range(n: int):
-    return [bin(i)[2:].zfill(n)[::-1] for i in range(2**n)]
+    if view:
+        return tensor
 
-def expand_matrix(matrix: np.ndarray, tensors: int, positions: list, axis: int = 0):
-    m, n = matrix.shape
+    if axis == 0:
+        return tensor.reshape(2**full_tensors, n)
 
-    matrix_dict = {}
-    for v in range(m if axis == 0 else n):
-        values = matrix[v] if axis == 0 else matrix[:, v]
-        matrix_dict[bin(v)[2:].zfill(tensors)[::-1]] = values
+    return tensor.reshape(m, 2**full_tensors)
 
-    expected_positions = gen_little_endian_range(tensors+len(positions))
+def get_subsystem_distribution(matrix: np.ndarray, axis: int, effect: tuple, cause: tuple, cache: MarginalizationCache = None):
+    """
+    Reduce a matrix to the subsystem of the given effects and causes.
+    The columns of all the effects are selected at once and marginalized together over the causes outside the subsystem.
+    If a cache is given, TPMs reduced to the same subsystem are reused across calls.
 
-    new_shape = (len(expected_positions), n) if axis == 0 else (m, len(expected_positions))
-    new_m = np.zeros(new_shape)
+    params:
+    matrix: np.ndarray    -> matrix of the full system
+    axis: int             -> axis of the causes, as in marginalize
+    effect: tuple         -> effects to keep, in the order of the resulting columns
+    cause: tuple          -> causes to keep
+    cache: MarginalizationCache -> shared cache of marginalized TPMs, only used when the causes are the rows (axis 1)
+    """
+    if cache is not None and axis == 1:
+        fingerprint = tpm_fingerprint(matrix)
+        subsystem = cache.get(fingerprint, effect, cause)
 
-    for pos in expected_positions:
-        index = get_binary_position(pos)
-        remaining_binaries = mask_binary(pos, unmask=positions)
-        if axis == 0:
-            new_m[index] = matrix_dict[remaining_binaries]
-        else:
-            new_m[:, index] = matrix_dict[remaining_binaries]
+        if subsystem is None:
+            subsystem = cache.put(fingerprint, effect, cause, get_subsystem_distribution(matrix, axis, effect, cause))
 
-    return new_m
+        return subsystem
 
-def get_subsystem_distribution(matrix: np.ndarray, axis: int, effect: tuple, cause: tuple):
     m,n = matrix.shape
-    new_m = np.zeros((2**len(cause), len(effect)*2))
 
     tensors = math.log2(m) if axis == 1 else n/2
     tensors = round(tensors)
@@ -239,11 +182,10 @@ def get_subsystem_distribution(matrix: np.ndarray, axis: int, effect: tuple, cau
 
     to_delete = tuple([x for x in full_pos if x not in cause])
 
-    for c, i in enumerate(effect):
-        indexes = [2*i, 2*i+1]
-        cols = matrix[:,indexes]
-        if len(cause) != tensors:
-            cols = recursive_marginalization(matrix[:,indexes], tensors, to_delete, axis)
-        new_m[:,[2*c,2*c+1]] = cols
+    columns = [c for i in effect for c in (2*i, 2*i+1)]
+    new_m = matrix[:, columns]
+
+    if len(to_delete) == 0:
+        return new_m
 
-    return new_m
\ No newline at end of file
+    return marginalize(new_m, tensors, to_delete, axis)
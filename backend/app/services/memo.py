@@ -0,0 +1,33 @@
+import numpy as np
+from .byte_cache import ByteBudgetCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+class Memo(ByteBudgetCache):
+    """
+    Bounded memoization of the probability distributions of effect subsets given cause subsets, at one state of the system.
+
+    Keys are canonical: the effects keep their order, because it is the order of the distribution, while the causes
+    are a set and are sorted. The `scope` separates spaces of entries, "MG" holds single effect factors taken
+    from marginalized matrices. Only successful lookups count as hits.
+    """
+
+    def __init__(self, binary_distribution: str = "", max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(max_bytes)
+        self.binary_distribution = binary_distribution
+
+    @staticmethod
+    def key(effect: tuple, cause: tuple, scope=None) -> tuple:
+        return (scope, tuple(int(e) for e in effect), tuple(sorted({int(c) for c in cause})))
+
+    def get(self, effect: tuple, cause: tuple, scope=None):
+        return self.lookup(self.key(effect, cause, scope))
+
+    def add(self, effect: tuple, cause: tuple, m: np.ndarray, scope=None) -> np.ndarray:
+        return self.store(self.key(effect, cause, scope), m)
+
+    def invalidate(self, effect: int):
+        """
+        Drop every entry whose distribution involves the given effect, e.g. after its columns of the matrix change.
+        """
+        self.discard(lambda key: effect in key[1])
@@ -0,0 +1,138 @@
+import numpy as np
+
+def cut_weights(costs: np.ndarray) -> np.ndarray:
+    """
+    Symmetric weight matrix of the bipartite graph given by a causes x effects cost matrix,
+    causes are the nodes [0, causes) and effects the nodes [causes, causes + effects).
+    """
+    causes_count, effects_count = costs.shape
+    weights = np.zeros((causes_count + effects_count, causes_count + effects_count))
+    weights[:causes_count, causes_count:] = costs
+    weights[causes_count:, :causes_count] = costs.T
+
+    return weights
+
+def cut_cost(weights: np.ndarray, side: np.ndarray) -> float:
+    """
+    Total weight of the edges between the nodes in `side` and the rest.
+    """
+    return float(weights[side][:, ~side].sum())
+
+def stoer_wagner(weights: np.ndarray):
+    """
+    Exact global minimum cut of an undirected weighted graph with the Stoer–Wagner algorithm, O(n^3).
+
+    params:
+        weights: symmetric non negative n x n weight matrix, n > 1
+
+    returns:
+        cost of the minimum cut and the boolean mask of the nodes in one of its sides
+    """
+    n = len(weights)
+    w = weights.astype(float)
+    np.fill_diagonal(w, 0.0)
+
+    merged = np.eye(n, dtype=bool) # merged[v] are the original nodes merged into v
+    active = np.ones(n, dtype=bool)
+
+    best_cost = float('inf')
+    best_side = None
+
+    for _ in range(n - 1):
+        # Minimum cut phase: add the most tightly connected node until every active node is added
+        nodes = np.flatnonzero(active)
+        connection = w[nodes[0]].copy()
+        added = ~active
+        added[nodes[0]] = True
+        previous, last = nodes[0], nodes[0]
+
+        for _ in range(len(nodes) - 1):
+            previous, last = last, int(np.argmax(np.where(added, -np.inf, connection)))
+            added[last] = True
+            connection += w[last]
+
+        cut_of_phase = float(connection[last])
+
+        if cut_of_phase < best_cost:
+            best_cost = cut_of_phase
+            best_side = merged[last].copy()
+
+        # Merge the last two added nodes
+        w[previous] += w[last]
+        w[:, previous] += w[:, last]
+        w[previous, previous] = 0.0
+        w[last] = 0.0
+        w[:, last] = 0.0
+        merged[previous] |= merged[last]
+        active[last] = False
+
+    return best_cost, best_side
+
+def refine_cut(weights: np.ndarray, side: np.ndarray):
+    """
+    Fiduccia–Mattheyses style refinement: moves single nodes to the other side while the cut gets cheaper,
+    keeping both sides non empty. The connection of every node to `side` is updated incrementally after each move.
+
+    returns:
+        cost of the refined cut and the boolean mask of the nodes in one of its sides
+    """
+    side = side.copy()
+    degrees = weights.sum(axis=1)
+    to_side = weights[:, side].sum(axis=1)
+    cost = float(to_side[~side].sum())
+
+    while True:
+        # Moving v changes the cut by its weight to its own side minus its weight to the other side
+        own = np.where(side, to_side, degrees - to_side)
+        delta = 2 * own - degrees
+
+        size = side.sum()
+        delta[side & (size == 1)] = np.inf
+        delta[~side & (size == len(side) - 1)] = np.inf
+
+        v = int(np.argmin(delta))
+        if delta[v] >= -1e-12:
+            return max(cost, 0.0), side
+
+        cost += float(delta[v])
+        to_side += weights[v] if not side[v] else -weights[v]
+        side[v] = not side[v]
+
+def spectral_cut(weights: np.ndarray):
+    """
+    Approximate global minimum cut: sweep over the nodes ordered by the Fiedler vector of the graph laplacian,
+    keeping the cheapest prefix, then refine it with single node moves (see `refine_cut`).
+
+    params:
+        weights: symmetric non negative n x n weight matrix, n > 1
+
+    returns:
+        cost of the cut and the boolean mask of the nodes in one of its sides
+    """
+    n = len(weights)
+    degrees = weights.sum(axis=1)
+    laplacian = np.diag(degrees) - weights
+    _, vectors = np.linalg.eigh(laplacian)
+    order = np.argsort(vectors[:, 1], kind="stable")
+
+    # Adding v to the side changes the cut by its degree minus twice its weight to the side
+    prefix_weights = np.cumsum(weights[order][:, order], axis=1)
+    inner = np.concatenate([[0.0], prefix_weights[np.arange(1, n), np.arange(n - 1)]])
+    costs = np.cumsum(degrees[order] - 2 * inner)[:-1]
+
+    k = int(np.argmin(costs))
+    side = np.zeros(n, dtype=bool)
+    side[order[:k+1]] = True
+
+    # The cheapest single node cut is always a candidate too
+    v = int(np.argmin(degrees))
+    if degrees[v] < costs[k]:
+        side = np.zeros(n, dtype=bool)
+        side[v] = True
+
+    return refine_cut(weights, side)
+
+CUT_METHODS = {
+    "stoer_wagner": stoer_wagner,
+    "spectral": spectral_cut,
+}
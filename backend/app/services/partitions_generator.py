@@ -1,5 +1,3 @@
-from itertools import combinations as iter_combinations
-
 def calculate_negative_set(m, a, b):
     """
     Calculate the negative set for a given matrix.
@@ -7,62 +5,71 @@ def calculate_negative_set(m, a, b):
     negative_a = set(m[0]).difference(a)
     negative_b = set(m[1]).difference(b)
 
-    return tuple(negative_a), tuple(negative_b)
+    return tuple(sorted(negative_a)), tuple(sorted(negative_b))
 
-def cartesian_product(a, b, len_a, len_b, include_negative_set=False, m=None):
-  """
-  Calculates the Cartesian product of two lists `a` and `b`.
+def count_gray_positions(m) -> int:
+    """
+    Number of positions of the walk of `gen_gray_partitions` for a given matrix `m`, valid partitions or not.
+    """
+    return 2**(len(m[0]) + len(m[1]) - 1) if len(m[0]) + len(m[1]) > 0 else 0
 
-  The Cartesian product of two sets A and B is the set of ordered pairs (a, b) where a belongs to A and b belongs to B.
+def count_gray_partitions(m) -> int:
+    """
+    Number of partitions yielded by `gen_gray_partitions` for a given matrix `m`: every pair of a proper subset of the
+    effects and a proper subset of the causes, taken once with its mirror, plus a single effect against everything else.
+    """
+    effects, causes = len(m[0]), len(m[1])
+    proper_effects, proper_causes = 2**effects - 2, 2**causes - 2
 
-  Args:
-      a (list): The first list of elements.
-      b (list): The second list of elements.
-      len_a (int): The length of the first list (assumed to be pre-calculated for efficiency).
-      len_b (int): The length of the second list (assumed to be pre-calculated for efficiency).
+    if proper_effects <= 0 or proper_causes <= 0:
+        return 0
 
-  Returns:
-      list: A list containing all possible combinations (ordered pairs) from the Cartesian product of `a` and `b`.
-  """
-  prod = []
-  items_pushed_a = set()
-  items_pushed_b = set()
+    return (proper_effects // 2) * proper_causes + effects
 
-  for i in range(len(a)):
-      for j in range(len(b)):
-          if len(a[i]) == 1 and str(a[i]) not in items_pushed_a:
-              neg_a, neg_b = calculate_negative_set(m, a[i], tuple())
-              prod.append([a[i], tuple(), neg_a, neg_b])
-              items_pushed_a.add(str(a[i]))
-          if len(b[j]) == 1 and str(b[j]) not in items_pushed_b:
-              neg_a, neg_b = calculate_negative_set(m, tuple(), b[j])
-              prod.append([tuple(), b[j], neg_a, neg_b])
-              items_pushed_b.add(str(b[j]))
+def is_valid_partition(a, b, effects, causes):
+    """
+    Whether (a, b) against its complement is a bipartition of the system e1 evaluates: both sides hold a proper subset
+    of the effects and of the causes, or one side is a single effect and no cause. Partitions cutting a single cause
+    and no effect, [(), (c,), ...], are never evaluated.
+    """
+    if 0 < len(a) < effects and 0 < len(b) < causes:
+        return True
 
-          neg_a, neg_b = calculate_negative_set(m, a[i], b[j])
-          prod.append([a[i], b[j], neg_a, neg_b])
+    if (len(a), len(b)) in ((1, 0), (effects - 1, causes)):
+        return effects > 1 and causes > 1
 
-  return prod
+    return False
 
-def gen_system_partitions(m):
+def gen_gray_partitions(m, start=0, stop=None):
     """
-    Generates all possible system partitions for a given matrix `m`.
+    Lazily generates the bipartitions of the system (see `is_valid_partition`) following a Gray code walk over the
+    nodes, so consecutive positions of the walk differ by a single node moved from one side to the other.
 
-    Args:
-        m (list): A 2D list representing the matrix for which to generate system partitions.
+    Effects and causes are the bits of a mask telling the nodes of the first side. The last cause always stays in
+    the second side, which makes every bipartition appear once and not its mirror. Positions whose mask is not a
+    bipartition of the system are walked but not yielded, and the walk position k has the mask k ^ (k >> 1),
+    so the walk can be split by ranges of positions [start, stop).
 
-    Returns:
-        list: A list containing all possible system partitions represented as a list of lists.
-            Each inner list represents a group of related elements (a subset of a row).
+    Args:
+        m (list): A list with the effects and the causes of the system.
+        start (int): First position of the walk.
+        stop (int): Position after the last one of the walk, the end of the walk if None.
 
-    Raises:
-        ValueError: If the input matrix `m` is not a 2D list.
+    Yields:
+        list: A partition [a, b, negative_a, negative_b] where each element is a tuple of nodes.
     """
-    all_combinations =[[], []]
+    effects, causes = tuple(m[0]), tuple(m[1])
+    nodes = effects + causes
+    stop = count_gray_positions(m) if stop is None else min(stop, count_gray_positions(m))
+
+    for k in range(start, stop):
+        mask = k ^ (k >> 1)
+        side = [(mask >> i) & 1 for i in range(len(nodes))]
+
+        a = tuple(e for i, e in enumerate(effects) if side[i])
+        b = tuple(c for j, c in enumerate(causes) if side[len(effects) + j])
 
-    for i, row in enumerate(m):
-      for j in range(1, len(row)): # 1 to n-1 because we don't want to include the full or empty row
-          for combination in iter_combinations(row, j):
-              all_combinations[i].append(combination)
+        if not is_valid_partition(a, b, len(effects), len(causes)):
+            continue
 
-    return cartesian_product(*all_combinations, len_a=len(m[0]), len_b=len(m[1]), include_negative_set=True, m=m)
\ No newline at end of file
+        yield [a, b, *calculate_negative_set(m, a, b)]
@@ -0,0 +1,74 @@
+import numpy as np
+from .byte_cache import ByteBudgetCache
+from .marginalization_cache import tpm_fingerprint
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+NEAR_MATCH_TOLERANCE = 0.1
+
+def similar_distances(distances: np.ndarray, other: np.ndarray, tolerance: float = NEAR_MATCH_TOLERANCE) -> bool:
+    """
+    Whether two distance matrices have the same edges, the same zero cost (removed) edges, and finite weights
+    whose difference has a norm within `tolerance` of the norm of the weights of `other`.
+    """
+    if distances.shape != other.shape:
+        return False
+
+    finite = np.isfinite(other)
+    if not np.array_equal(np.isfinite(distances), finite) or not np.array_equal(distances == 0, other == 0):
+        return False
+
+    return np.linalg.norm(distances[finite] - other[finite]) <= tolerance * np.linalg.norm(other[finite])
+
+class PheromoneStore(ByteBudgetCache):
+    """
+    Process-wide LRU store of the final pheromone of ACO runs, used to warm-start later runs.
+
+    Entries are keyed by the node ids of the graph and the fingerprint of its distance matrix, and hold the pheromone
+    stacked over the distances, read only. A run over the same graph gets the pheromone of that graph; a run over a
+    graph with the same nodes and similar weights (see `similar_distances`), e.g. from a slightly changed TPM, gets
+    the most recently saved pheromone of such a graph.
+    The least recently used entries are evicted once the stored arrays exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(max_bytes)
+        self.near_hits = 0
+
+    def load(self, node_ids: tuple, distances: np.ndarray):
+        """
+        Pheromone saved for the graph, or for a similar graph over the same nodes when there is none for the graph.
+
+        returns:
+            the pheromone, or None, and whether it matched the graph exactly ("exact"), a similar graph ("near") or nothing
+        """
+        exact_key = (tuple(node_ids), tpm_fingerprint(distances))
+
+        with self.lock:
+            if exact_key in self.entries:
+                self.entries.move_to_end(exact_key)
+                self.hits += 1
+                return self.entries[exact_key][0], "exact"
+
+            for key in reversed(self.entries):
+                if key[0] == exact_key[0] and similar_distances(distances, self.entries[key][1]):
+                    self.entries.move_to_end(key)
+                    self.near_hits += 1
+                    return self.entries[key][0], "near"
+
+            self.misses += 1
+
+        return None, None
+
+    def save(self, node_ids: tuple, distances: np.ndarray, pheromone: np.ndarray) -> np.ndarray:
+        entry = np.stack([pheromone, distances]).astype(float)
+        entry.setflags(write=False)
+
+        return self.store((tuple(node_ids), tpm_fingerprint(distances)), entry)[0]
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["near_hits"] = self.near_hits
+
+        return stats
+
+pheromone_store = PheromoneStore()
@@ -0,0 +1,48 @@
+import time
+
+class SearchBudget:
+    """
+    Time and evaluation budget of a search, the search returns the best result found so far once it is exhausted.
+
+    The deadline is an absolute wall clock time, so it can be handed to other processes. The evaluations can be
+    counted in a shared `multiprocessing.Value` to spend a single budget from several processes.
+    """
+
+    def __init__(self, time_budget_secs: float = None, max_evaluations: int = None, deadline: float = None, shared_evaluations=None):
+        if deadline is None and time_budget_secs is not None:
+            deadline = time.time() + time_budget_secs
+
+        self.deadline = deadline
+        self.max_evaluations = max_evaluations
+        self.shared_evaluations = shared_evaluations
+        self.local_evaluations = 0
+
+    @property
+    def evaluations(self) -> int:
+        if self.shared_evaluations is not None:
+            return self.shared_evaluations.value
+
+        return self.local_evaluations
+
+    def spend(self, evaluations: int = 1):
+        self.local_evaluations += evaluations
+
+        if self.shared_evaluations is not None:
+            with self.shared_evaluations.get_lock():
+                self.shared_evaluations.value += evaluations
+
+    def exhausted(self) -> bool:
+        if self.deadline is not None and time.time() >= self.deadline:
+            return True
+
+        return self.max_evaluations is not None and self.evaluations >= self.max_evaluations
+
+def search_stats(covered: int, total: int, interrupted: bool, proven_optimal: bool) -> dict:
+    """
+    Stats of how much of the search space a search covered and whether its result is proven optimal.
+    """
+    return {
+        "coverage": covered / total if total > 0 else 1.0,
+        "budget_exhausted": interrupted,
+        "proven_optimal": proven_optimal,
+    }
@@ -0,0 +1,137 @@
+import unittest
+import numpy as np
+from app.services.aco import AntColony, rank_descending
+from app.services.edges_cut_removal import build_edges_graph
+from app.schemas.graphs import GraphSchema, GraphNode, NodeEdge
+from app.services.pheromone_store import PheromoneStore
+
+def weighted_graph(edges: dict, nodes: int) -> GraphSchema:
+    return GraphSchema(name="test", data=[
+        GraphNode(id=str(i), label=str(i), coordenates=None, linkedTo=[NodeEdge(nodeId=str(j), weight=w) for j, w in edges.get(i, [])])
+        for i in range(nodes)
+    ])
+
+class TestAntColony(unittest.TestCase):
+    def test_distance_matrix(self):
+        colony = AntColony(weighted_graph({0: [(1, 2.0), (2, None)], 2: [(0, -1.0)]}, 3), n_ants=2, n_best=1, n_iterations=1, decay=0.5)
+
+        self.assertEqual(colony.distances[0, 1], 2.0)
+        self.assertEqual(colony.distances[2, 0], -1.0)
+        self.assertTrue(np.isinf(colony.distances[0, 2]))
+        np.testing.assert_array_equal(colony.attractiveness[:, 0], [0.0, 0.0, 0.0])
+        self.assertEqual(colony.attractiveness[0, 1], 0.5)
+
+    def test_paths_are_tours(self):
+        rng = np.random.default_rng(0)
+        edges = {i: [(j, float(rng.random())) for j in range(6) if j != i] for i in range(6)}
+        colony = AntColony(weighted_graph(edges, 6), n_ants=5, n_best=1, n_iterations=1, decay=0.5)
+
+        for path, length in colony.construct_solutions():
+            self.assertEqual(sorted(path[:, 0].tolist()), list(range(6)))
+            np.testing.assert_array_equal(path[1:, 0], path[:-1, 1])
+            self.assertEqual(path[-1, 1], 0)
+            self.assertAlmostEqual(length, colony.distances[path[:, 0], path[:, 1]].sum())
+
+    def test_move_probabilities(self):
+        colony = AntColony(weighted_graph({0: [(1, 1.0), (2, 3.0)]}, 3), n_ants=4000, n_best=1, n_iterations=1, decay=0.5)
+        colony.rng = np.random.default_rng(1)
+        first_moves = colony.construct_paths(0, 4000)[:, 0, 1]
+
+        self.assertAlmostEqual(np.mean(first_moves == 1), 0.75, delta=0.03)
+
+    def test_pheromone_update(self):
+        colony = AntColony(weighted_graph({0: [(1, 2.0)], 1: [(0, 4.0)]}, 2), n_ants=2, n_best=1, n_iterations=1, decay=0.5)
+        path = np.array([[0, 1], [1, 0]])
+        colony.spread_pheronome([(path, 6.0), (path[::-1], 6.0)], 1)
+        colony.evaporate_pheromone()
+
+        np.testing.assert_allclose(colony.pheromone, [[0.125, 0.375], [0.25, 0.125]])
+
+    def test_seeded_runs_are_reproducible(self):
+        rng = np.random.default_rng(2)
+        edges = {i: [(j, float(rng.random())) for j in range(8) if (i < 4) != (j < 4)] for i in range(8)}
+
+        def run(seed, workers=None):
+            colony = AntColony(weighted_graph(edges, 8), n_ants=10, n_best=2, n_iterations=5, decay=0.85, seed=seed, workers=workers)
+            best_solutions, _ = colony.run()
+            return colony.pheromone, [length for _, length in best_solutions]
+
+        pheromone, lengths = run(3)
+        parallel_pheromone, parallel_lengths = run(3, workers=2)
+
+        np.testing.assert_array_equal(pheromone, run(3)[0])
+        np.testing.assert_array_equal(pheromone, parallel_pheromone)
+        self.assertEqual(lengths, parallel_lengths)
+        self.assertFalse(np.array_equal(pheromone, run(4)[0]))
+
+    def test_default_seed_fits_a_json_number(self):
+        colony = AntColony(weighted_graph({0: [(1, 1.0)], 1: [(0, 1.0)]}, 2), n_ants=2, n_best=1, n_iterations=1, decay=0.5)
+
+        self.assertIsInstance(colony.seed, int)
+        self.assertLess(colony.seed, 2**53)
+        self.assertEqual(float(colony.seed), colony.seed)
+
+    def test_early_stopping_and_telemetry(self):
+        # Path A' - A - B' - B - C' of e3: every tour costs inf and the four edges are candidate cuts
+        graph = build_edges_graph(np.array([[0.3, 0.5, 0.0], [0.0, 0.2, 0.4]]), np.ones((2, 3), dtype=bool))
+
+        stagnant = AntColony(graph, n_ants=4, n_best=1, n_iterations=200, decay=0.85, seed=1, stagnation_iterations=5)
+        stagnant.run()
+        self.assertEqual(stagnant.stop_reason, "stagnation")
+        self.assertGreater(stagnant.completed_iterations, 5)
+        self.assertLess(stagnant.completed_iterations, 200)
+        self.assertEqual(len(stagnant.telemetry), stagnant.completed_iterations)
+        self.assertEqual(set(stagnant.telemetry[0]), {"iteration", "best_cost", "mean_cost", "ms", "ants", "pheromone_entropy"})
+        self.assertEqual(stagnant.telemetry[0]["ants"], 4)
+        self.assertIsNone(stagnant.telemetry[0]["best_cost"])
+
+        concentrated = AntColony(graph, n_ants=4, n_best=1, n_iterations=200, decay=0.85, seed=1, entropy_threshold=0.9)
+        concentrated.run()
+        self.assertEqual(concentrated.stop_reason, "entropy")
+        self.assertLessEqual(concentrated.telemetry[-1]["pheromone_entropy"], 0.9)
+
+        full = AntColony(graph, n_ants=4, n_best=1, n_iterations=10, decay=0.85, seed=1)
+        full.run()
+        self.assertEqual(full.stop_reason, "max_iterations")
+        self.assertEqual(full.completed_iterations, 10)
+
+    def test_finite_costs_in_telemetry(self):
+        rng = np.random.default_rng(5)
+        edges = {i: [(j, float(rng.random())) for j in range(6) if (i < 3) != (j < 3)] for i in range(6)}
+
+        colony = AntColony(weighted_graph(edges, 6), n_ants=6, n_best=1, n_iterations=3, decay=0.85, seed=1)
+        colony.run()
+        self.assertLessEqual(colony.telemetry[0]["best_cost"], colony.telemetry[0]["mean_cost"])
+
+    def test_rank_descending(self):
+        rng = np.random.default_rng(6)
+        values = rng.integers(0, 5, 40).astype(float)
+        keys = rng.permutation(40)
+        expected = sorted(range(40), key=lambda k: (-values[k], keys[k]))
+
+        self.assertEqual(list(rank_descending(values, keys, 7)), expected)
+
+    def test_partition_from_bridge(self):
+        # 0, 1, 2, 3 form a cycle, 1 -> 4 is the only link of node 4
+        colony = AntColony(weighted_graph({0: [(2, 1.0), (3, 1.0)], 1: [(2, 1.0), (3, 1.0), (4, 1.0)]}, 5), n_ants=2, n_best=1, n_iterations=1, decay=0.5)
+        colony.pheromone[0, 2] = 5.0
+        colony.pheromone[1, 4] = 1.0
+
+        self.assertEqual(colony.generate_partitions(), [["0", "1", "2", "3"], ["4"]])
+
+    def test_warm_start(self):
+        rng = np.random.default_rng(7)
+        edges = {i: [(j, float(rng.random())) for j in range(6) if (i < 3) != (j < 3)] for i in range(6)}
+        store = PheromoneStore()
+
+        cold = AntColony(weighted_graph(edges, 6), n_ants=6, n_best=1, n_iterations=5, decay=0.85, seed=1, pheromone_store=store)
+        cold.run()
+        warm = AntColony(weighted_graph(edges, 6), n_ants=6, n_best=1, n_iterations=5, decay=0.85, seed=1, pheromone_store=store)
+
+        self.assertIsNone(cold.warm_start)
+        self.assertEqual(warm.warm_start, "exact")
+        self.assertAlmostEqual(warm.pheromone.sum(), 1.0)
+        np.testing.assert_allclose(warm.pheromone, cold.pheromone / cold.pheromone.sum())
+
+if __name__ == '__main__':
+    unittest.main()
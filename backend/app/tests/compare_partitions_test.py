@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+import numpy as np
+from app.services import compare_partitions
+from app.services.compare_partitions import calculate_minimum_partition, calculate_minimum_partitions, get_probability_distribution, PartitionEvaluator
+from app.services.marginalization_lattice import MarginalizationLattice
+from app.services.memo import Memo
+from app.services.matrix import get_emd, get_subsystem_distribution, product_tensor
+from app.services.bit_index import binary_to_index
+from app.services.partitions_generator import gen_gray_partitions
+from app.services.search_budget import SearchBudget
+from app.tests.helpers import random_tpm
+
+class TestMinimumPartition(unittest.TestCase):
+    def test_evaluator_matches_marginalized_effects(self):
+        tpm = random_tpm(3, 4, seed=9)
+        evaluator = PartitionEvaluator(tpm, "011", Memo("011"), MarginalizationLattice(tpm))
+
+        for partition in [[(0, 2), (1,), (1, 3), (0, 2)], [(0,), (1,), (1, 2, 3), (0, 2)], [(0,), (), (1, 2, 3), (0, 1, 2)]]:
+            # Every effect only depends on the causes of its own side
+            factors = []
+            for effect in range(4):
+                causes = partition[1] if effect in partition[0] else partition[3]
+                subsystem = get_subsystem_distribution(tpm, axis=1, effect=(effect,), cause=causes)
+                factors.append(subsystem[binary_to_index("".join("011"[c] for c in causes))])
+
+            expected = product_tensor(np.concatenate(factors)[None, :], row=0)[0]
+
+            np.testing.assert_allclose(evaluator.distribution(partition), expected, rtol=1e-12)
+
+    def test_skips_cause_only_partitions(self):
+        tpm = random_tpm(3, 3, seed=10)
+        tpm[4:] = tpm[:4]
+        res = calculate_minimum_partition(tpm, "110")
+
+        self.assertEqual(res.stats["evaluated_partitions"] + res.stats["pruned_partitions"], 3*6 + 3)
+        self.assertEqual(res.stats["coverage"], 1.0)
+        self.assertGreater(len(res.partition[0]), 0)
+        self.assertGreater(len(res.partition[2]), 0)
+
+    def test_pruning_keeps_minimum(self):
+        tpm = random_tpm(3, 3, seed=12)
+        res = calculate_minimum_partition(tpm, "010")
+
+        lattice = MarginalizationLattice(tpm)
+        evaluator = PartitionEvaluator(tpm, "010", Memo("010"), lattice)
+        original = get_probability_distribution(tpm, "010", (0, 1, 2), (0, 1, 2), (0, 1, 2), Memo("010"), lattice)
+        distances = [get_emd(original[0], evaluator.distribution(p)) for p in gen_gray_partitions([(0, 1, 2), (0, 1, 2)])]
+
+        self.assertAlmostEqual(res.distance, min(distances))
+        self.assertEqual(res.stats["evaluated_partitions"] + res.stats["pruned_partitions"], len(distances))
+        self.assertGreater(res.stats["pruned_partitions"], 0)
+
+    def test_evaluation_budget(self):
+        tpm = random_tpm(4, 4, seed=13)
+        complete = calculate_minimum_partition(tpm, "0110")
+        budgeted = calculate_minimum_partition(tpm, "0110", budget=SearchBudget(max_evaluations=2))
+
+        self.assertTrue(complete.stats["proven_optimal"])
+        self.assertEqual(complete.stats["coverage"], 1.0)
+        self.assertFalse(budgeted.stats["proven_optimal"])
+        self.assertTrue(budgeted.stats["budget_exhausted"])
+        self.assertEqual(budgeted.stats["evaluated_partitions"], 2)
+        self.assertLess(budgeted.stats["coverage"], 1.0)
+        self.assertGreaterEqual(budgeted.distance, complete.distance)
+
+    def test_batch_matches_single_states(self):
+        tpm = random_tpm(3, 4, seed=14)
+        states = ["000", "100", "011", "111"]
+        batch = calculate_minimum_partitions(tpm, states)
+
+        self.assertEqual([res.binary_distribution for res in batch], states)
+        for res in batch:
+            single = calculate_minimum_partition(tpm, res.binary_distribution)
+
+            self.assertAlmostEqual(res.distance, single.distance, places=12)
+            np.testing.assert_allclose(res.original_distribution, single.original_distribution)
+            self.assertTrue(res.stats["proven_optimal"])
+
+    def test_parallel_matches_sequential(self):
+        tpm = random_tpm(3, 3, seed=8)
+
+        sequential = calculate_minimum_partition(tpm, "101")
+        with mock.patch.object(compare_partitions, "PARALLEL_MIN_POSITIONS", 0):
+            parallel = calculate_minimum_partition(tpm, "101", workers=2)
+
+        self.assertEqual(parallel.distance, sequential.distance)
+        self.assertEqual(parallel.partition, sequential.partition)
+        self.assertEqual(parallel.min_cut_distribution, sequential.min_cut_distribution)
+        self.assertEqual(parallel.stats["workers"], 2)
+
+    def test_small_system_runs_sequentially(self):
+        tpm = random_tpm(3, 3, seed=8)
+
+        res = calculate_minimum_partition(tpm, "101", workers=4)
+
+        self.assertEqual(res.stats["workers"], 1)
+        self.assertIsNotNone(res.stats["rebuilt_halves"])
+
+if __name__ == '__main__':
+    unittest.main()
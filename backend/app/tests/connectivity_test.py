@@ -0,0 +1,22 @@
+import unittest
+from app.services.connectivity import DisjointSet, find_bridges
+
+class TestConnectivity(unittest.TestCase):
+    def test_disjoint_set(self):
+        ds = DisjointSet(5)
+        self.assertTrue(ds.union(0, 3))
+        self.assertTrue(ds.union(3, 4))
+        self.assertFalse(ds.union(4, 0))
+
+        self.assertEqual(ds.components, 3)
+        self.assertEqual(ds.groups(), [[0, 3, 4], [1], [2]])
+
+    def test_find_bridges(self):
+        # triangle 0-1-2, bridge 2-3, parallel edges 3-4, isolated 5
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 3)]
+
+        self.assertEqual(find_bridges(6, edges), [False, False, False, True, False, False])
+        self.assertEqual(find_bridges(3, [(0, 1), (1, 2)]), [True, True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+from app.services.edges_cut_removal import calculate_edges_costs, calculate_edges_cut, get_edges_bridges, get_edges_components, get_probability_distribution_with_new_effect, solve_cost_matrix_cut
+from app.services.gen_graph import generateNodeLabels
+from app.services.marginalization_lattice import MarginalizationLattice
+from app.services.matrix import product_tensor
+from app.services.memo import Memo
+from app.services.search_budget import SearchBudget
+from app.tests.helpers import random_tpm
+
+class TestEdgeRemoval(unittest.TestCase):
+    def test_incremental_distribution_matches_new_matrix(self):
+        tpm = random_tpm(3, 4, seed=11)
+        lattice = MarginalizationLattice(tpm)
+        memo = Memo("101")
+
+        for effect in range(4):
+            for target_cause in [(0, 2), (1, 2), (0, 1)]:
+                res = get_probability_distribution_with_new_effect(tpm, "101", effect, target_cause, (0, 1, 2), lattice, memo)
+                expected = product_tensor(matrix=res.new_matrix, row=5)
+
+                np.testing.assert_allclose(res.vector_resultant, expected, rtol=1e-12)
+
+    def test_matrix_is_built_lazily(self):
+        tpm = random_tpm(3, 3, seed=12)
+        res = get_probability_distribution_with_new_effect(tpm, "110", 1, (0, 2), (0, 1, 2))
+
+        self.assertIsNone(res._matrices)
+        np.testing.assert_array_equal(res.new_matrix[:, [0, 1, 4, 5]], tpm[:, [0, 1, 4, 5]])
+        self.assertIs(res.expanded_matrix.base, res.new_matrix)
+
+    def test_independent_effects_are_cut(self):
+        tpm = random_tpm(2, 2, seed=13)
+        tpm[:, 0:2] = tpm[[0, 1, 0, 1], 0:2] # effect 0 only depends on cause 0
+        tpm[:, 2:4] = tpm[[0, 0, 2, 2], 2:4] # effect 1 only depends on cause 1
+
+        min_cut, costs = calculate_edges_costs(tpm, "10", 2, 2, (0, 1), (0, 1))
+
+        self.assertEqual(min_cut.cost, 0.0)
+        self.assertEqual(sorted(map(sorted, min_cut.connected_components.values())), [["A", "A'"], ["B", "B'"]])
+        self.assertEqual(costs[1, 0], 0.0)
+        self.assertEqual(costs[0, 1], 0.0)
+        self.assertGreater(costs[0, 0], 0.0)
+        self.assertEqual(min_cut.evaluated_edges, 4)
+
+    def test_any_number_of_causes(self):
+        tpm = random_tpm(4, 2, seed=14)
+        min_cut, costs = calculate_edges_costs(tpm, "0110", 4, 2, (0, 1), (0, 1, 2, 3))
+
+        self.assertEqual(costs.shape, (4, 2))
+        self.assertEqual(min_cut.evaluated_edges, 8)
+        self.assertEqual(len(min_cut.graph.data), 6)
+
+    def test_bridges_match_components(self):
+        rng = np.random.default_rng(15)
+
+        for _ in range(20):
+            active_edges = rng.random((4, 3)) < 0.4
+            components_count, bridges = get_edges_bridges(active_edges)
+
+            self.assertEqual(components_count, len(get_edges_components(active_edges)))
+            for cause, effect in zip(*np.nonzero(active_edges)):
+                removed = len(get_edges_components(active_edges, removed_edges=[(cause, effect)]))
+                self.assertEqual(removed, components_count + ((cause, effect) in bridges))
+
+    def test_interrupted_run_reports_no_cut(self):
+        tpm = random_tpm(3, 3, seed=4)
+
+        full = calculate_edges_cut(tpm, "010", 3, 3, (0, 1, 2), (0, 1, 2))
+        budgeted = calculate_edges_cut(tpm, "010", 3, 3, (0, 1, 2), (0, 1, 2), budget=SearchBudget(max_evaluations=3))
+
+        self.assertGreater(full.distance, 0.0)
+        self.assertTrue(budgeted.stats["budget_exhausted"])
+        self.assertIsNone(budgeted.distance)
+        self.assertIsNone(budgeted.partition)
+        self.assertEqual(sum(cost is not None for costs in budgeted.stats["edges_costs"] for cost in costs), 3)
+
+    def test_cost_matrix_cut_methods(self):
+        costs = np.array([[2.0, 0.1, 0.0], [3.0, 0.2, 0.1], [0.1, 4.0, 5.0]])
+
+        exact = solve_cost_matrix_cut(costs, method="stoer_wagner")
+        self.assertAlmostEqual(exact.cost, 0.5)
+        self.assertEqual(exact.partition, [[1, 2], [2]])
+        self.assertAlmostEqual(solve_cost_matrix_cut(costs, method="spectral").cost, 0.5)
+        self.assertGreater(solve_cost_matrix_cut(costs, method="heatmap").cost, exact.cost)
+
+        with self.assertRaises(ValueError):
+            solve_cost_matrix_cut(costs, method="unknown")
+
+    def test_node_labels_past_the_alphabet(self):
+        labels = generateNodeLabels(60)
+
+        self.assertEqual(labels[25:28], ["Z", "AA", "AB"])
+        self.assertEqual(labels[52], "BA")
+        self.assertEqual(len(set(labels)), 60)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import time
+import unittest
+import numpy as np
+from scipy.optimize import linprog
+from app.services.emd import hypercube_emd, min_cost_flow_emd, product_marginals, node_marginals, marginal_lower_bound, total_variation
+
+def product_distribution(marginals):
+    distribution = np.ones(1)
+    for m in marginals:
+        distribution = np.concatenate([distribution * (1 - m), distribution * m])
+
+    return distribution
+
+def transport_emd(a, b):
+    """
+    Reference EMD solving the dense transport problem over every pair of states.
+    """
+    size = len(a)
+    states = np.arange(size)
+    cost = np.array([[bin(i ^ j).count("1") for j in states] for i in states], dtype=float)
+
+    rows = np.zeros((size, size * size))
+    columns = np.zeros((size, size * size))
+    for i in states:
+        rows[i, i * size:(i + 1) * size] = 1
+        columns[i, i::size] = 1
+
+    res = linprog(cost.ravel(), A_eq=np.vstack([rows, columns]), b_eq=np.concatenate([a, b]), method="highs")
+    return res.fun
+
+class TestHypercubeEMD(unittest.TestCase):
+    def test_identical_distributions(self):
+        a = np.array([0.1, 0.2, 0.3, 0.4])
+        self.assertAlmostEqual(hypercube_emd(a, a), 0.0)
+
+    def test_single_node(self):
+        self.assertAlmostEqual(hypercube_emd(np.array([0.75, 0.25]), np.array([0.25, 0.75])), 0.5)
+
+    def test_opposite_corners(self):
+        a = np.zeros(8)
+        b = np.zeros(8)
+        a[0] = 1.0
+        b[7] = 1.0
+        self.assertAlmostEqual(hypercube_emd(a, b), 3.0)
+
+    def test_matching_marginals(self):
+        # Same marginal per node but different joint distribution, every unit of mass moves one step
+        a = np.array([0.5, 0.0, 0.0, 0.5])
+        b = np.array([0.0, 0.5, 0.5, 0.0])
+        self.assertAlmostEqual(hypercube_emd(a, b), 1.0)
+
+    def test_against_transport_problem(self):
+        rng = np.random.default_rng(7)
+
+        for n in range(1, 5):
+            for _ in range(10):
+                a = rng.random(2**n) ** 4
+                b = rng.random(2**n)
+                a /= a.sum()
+                b /= b.sum()
+
+                self.assertAlmostEqual(hypercube_emd(a, b), transport_emd(a, b), places=9)
+
+    def test_product_distributions(self):
+        rng = np.random.default_rng(9)
+
+        for n in range(1, 8):
+            a = product_distribution(rng.random(n))
+            b = product_distribution(rng.random(n))
+
+            np.testing.assert_allclose(product_marginals(a), node_marginals(a))
+            self.assertAlmostEqual(hypercube_emd(a, b), min_cost_flow_emd(a, b), places=9)
+
+        self.assertIsNone(product_marginals(np.array([0.5, 0.0, 0.0, 0.5])))
+
+    def test_product_distributions_at_16_nodes(self):
+        rng = np.random.default_rng(10)
+        a_marginals, b_marginals = rng.random(16), rng.random(16)
+        a, b = product_distribution(a_marginals), product_distribution(b_marginals)
+
+        start = time.perf_counter()
+        emd = hypercube_emd(a, b)
+
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertAlmostEqual(emd, np.abs(a_marginals - b_marginals).sum())
+
+class TestLowerBounds(unittest.TestCase):
+    def test_node_marginals(self):
+        np.testing.assert_allclose(node_marginals(np.array([0.1, 0.2, 0.3, 0.4])), [0.6, 0.7])
+
+    def test_bounds_below_emd(self):
+        rng = np.random.default_rng(11)
+
+        for n in range(1, 7):
+            for _ in range(20):
+                a = rng.random(2**n) ** 3
+                b = rng.random(2**n)
+                a /= a.sum()
+                b /= b.sum()
+                emd = hypercube_emd(a, b)
+
+                self.assertLessEqual(total_variation(a, b), emd + 1e-12)
+                self.assertLessEqual(marginal_lower_bound(node_marginals(a), node_marginals(b)), emd + 1e-12)
+
+if __name__ == '__main__':
+    unittest.main()
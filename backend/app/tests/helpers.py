@@ -0,0 +1,10 @@
+import numpy as np
+
+def random_tpm(causes: int, effects: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    p = rng.random((2**causes, effects))
+    tpm = np.zeros((2**causes, 2*effects))
+    tpm[:, 0::2] = p
+    tpm[:, 1::2] = 1 - p
+
+    return tpm
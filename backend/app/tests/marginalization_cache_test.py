@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from app.services.marginalization_cache import MarginalizationCache, tpm_fingerprint
+from app.services.marginalization_lattice import MarginalizationLattice
+from app.services.matrix import get_subsystem_distribution
+from app.tests.helpers import random_tpm
+
+class TestMarginalizationCache(unittest.TestCase):
+    def test_fingerprint(self):
+        tpm = random_tpm(3, 2)
+
+        self.assertEqual(tpm_fingerprint(tpm), tpm_fingerprint(tpm.copy()))
+        self.assertNotEqual(tpm_fingerprint(tpm), tpm_fingerprint(random_tpm(3, 2, seed=1)))
+        self.assertNotEqual(tpm_fingerprint(tpm), tpm_fingerprint(tpm.reshape(4, 8)))
+
+    def test_lru_eviction_by_bytes(self):
+        cache = MarginalizationCache(max_bytes=2 * 64)
+        block = np.zeros(8)
+
+        cache.put("a", (0,), (0,), block)
+        cache.put("b", (0,), (0,), block)
+        cache.get("a", (0,), (0,))
+        cache.put("c", (0,), (0,), block)
+        stats = cache.stats()
+
+        self.assertIsNotNone(cache.get("a", (0,), (0,)))
+        self.assertIsNone(cache.get("b", (0,), (0,)))
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["bytes"], 2 * 64)
+
+    def test_lattice_reuses_shared_marginals(self):
+        cache = MarginalizationCache()
+        tpm = random_tpm(4, 3)
+
+        first = MarginalizationLattice(tpm, cache=cache)
+        first.get((0, 2))
+        second = MarginalizationLattice(tpm.copy(), cache=cache)
+        np.testing.assert_array_equal(second.get((0, 2)), first.get((0, 2)))
+        second.get((0, 2, 3))
+
+        self.assertEqual(second.stats()["misses"], 0)
+        self.assertEqual(second.stats()["shared_hits"], 2)
+
+    def test_subsystem_distribution(self):
+        cache = MarginalizationCache()
+        tpm = random_tpm(3, 3)
+
+        expected = get_subsystem_distribution(tpm, axis=1, effect=(0, 2), cause=(1, 2))
+        first = get_subsystem_distribution(tpm, axis=1, effect=(0, 2), cause=(1, 2), cache=cache)
+        second = get_subsystem_distribution(tpm.copy(), axis=1, effect=(0, 2), cause=(1, 2), cache=cache)
+
+        np.testing.assert_array_equal(first, expected)
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
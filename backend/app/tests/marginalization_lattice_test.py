@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from app.services.marginalization_lattice import MarginalizationLattice
+from app.services.matrix import marginalize
+from app.tests.helpers import random_tpm
+
+class TestMarginalizationLattice(unittest.TestCase):
+    def test_get_matches_marginalize(self):
+        tpm = random_tpm(4, 3)
+        lattice = MarginalizationLattice(tpm)
+
+        for cause in [(0, 1, 2), (1, 3), (2,), ()]:
+            removed = [c for c in range(4) if c not in cause]
+            np.testing.assert_allclose(lattice.get(cause), marginalize(tpm, 4, removed, axis=1))
+
+    def test_each_subset_is_computed_once(self):
+        lattice = MarginalizationLattice(random_tpm(3, 2))
+
+        lattice.get((0,))
+        lattice.get((0,))
+        lattice.get((1, 0))
+        stats = lattice.stats()
+
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_build(self):
+        lattice = MarginalizationLattice(random_tpm(4, 1))
+        lattice.build()
+
+        self.assertEqual(lattice.stats()["size"], 2**4)
+
+        lattice.get((1, 2))
+        self.assertEqual(lattice.stats()["hit_rate"], 1.0)
+
+    def test_replace_columns(self):
+        tpm = random_tpm(3, 2)
+        lattice = MarginalizationLattice(tpm)
+        lattice.get((0, 2))
+
+        new_columns = random_tpm(3, 1, seed=1)
+        lattice.replace_columns([2, 3], new_columns)
+
+        expected = tpm.copy()
+        expected[:, [2, 3]] = new_columns
+        np.testing.assert_allclose(lattice.get((0, 2)), marginalize(expected, 3, [1], axis=1))
+        np.testing.assert_allclose(tpm[:, [2, 3]], random_tpm(3, 2)[:, [2, 3]])
+
+if __name__ == '__main__':
+    unittest.main()
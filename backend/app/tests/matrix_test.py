@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+from app.services.bit_index import compressed_indices, index_to_binary
+from app.services.matrix import get_binary_position, expand_matrix, product_tensor, marginalize, get_subsystem_distribution
+from app.tests.helpers import random_tpm
+
+class TestBitIndex(unittest.TestCase):
+    def test_binary_position(self):
+        self.assertEqual(get_binary_position("100"), 1)
+        self.assertEqual(get_binary_position("011"), 6)
+        self.assertEqual(get_binary_position("011", mask=[0, 2]), 2)
+        self.assertEqual(get_binary_position("011", unmask=[0, 2]), 1)
+        self.assertEqual(get_binary_position("011", mask=[]), 0)
+        self.assertEqual(index_to_binary(6, 3), "011")
+
+    def test_compressed_indices(self):
+        self.assertEqual(compressed_indices(3, (0, 2)).tolist(), [0, 1, 0, 1, 2, 3, 2, 3])
+
+    def test_expand_matrix(self):
+        tpm = random_tpm(2, 1)
+        expanded = expand_matrix(tpm, tensors=2, positions=[1], axis=0)
+
+        self.assertEqual(expanded.shape, (8, 2))
+        for state in range(8):
+            kept = (state & 1) | ((state >> 2) << 1)
+            np.testing.assert_array_equal(expanded[state], tpm[kept])
+
+    def test_expand_matrix_view(self):
+        tpm = random_tpm(2, 2)
+        view = expand_matrix(tpm, tensors=2, positions=[0, 3], axis=0, view=True)
+
+        self.assertEqual(view.shape, (2, 2, 2, 2, 4))
+        self.assertFalse(view.flags.writeable)
+        np.testing.assert_array_equal(view.reshape(16, 4), expand_matrix(tpm, tensors=2, positions=[0, 3], axis=0))
+
+    def test_expand_columns(self):
+        tpm = random_tpm(2, 1).T
+        expanded = expand_matrix(tpm, tensors=2, positions=[2], axis=1)
+
+        np.testing.assert_array_equal(expanded, np.concatenate([tpm, tpm], axis=1))
+
+class TestProductTensor(unittest.TestCase):
+    def test_little_endian_joint_distribution(self):
+        tpm = random_tpm(3, 3, seed=1)
+        joint = product_tensor(tpm)
+
+        self.assertEqual(joint.shape, (8, 8))
+        for row in range(8):
+            for state in range(8):
+                expected = np.prod([tpm[row, 2*k + ((state >> k) & 1)] for k in range(3)])
+                self.assertAlmostEqual(joint[row, state], expected)
+
+    def test_single_row(self):
+        tpm = random_tpm(3, 4, seed=2)
+
+        np.testing.assert_array_equal(product_tensor(tpm, row=5), product_tensor(tpm)[[5]])
+
+class TestMarginalization(unittest.TestCase):
+    def test_marginalize_rows(self):
+        tpm = random_tpm(3, 2, seed=3)
+        marginalized = marginalize(tpm, tensors=3, positions=[0, 2], axis=1)
+
+        self.assertEqual(marginalized.shape, (2, 4))
+        np.testing.assert_allclose(marginalized[0], tpm[[0, 1, 4, 5]].mean(axis=0))
+        np.testing.assert_allclose(marginalized[1], tpm[[2, 3, 6, 7]].mean(axis=0))
+
+    def test_marginalize_columns(self):
+        tpm = random_tpm(2, 2, seed=4).T
+        marginalized = marginalize(tpm, tensors=2, positions=[1], axis=0)
+
+        self.assertEqual(marginalized.shape, (4, 2))
+        np.testing.assert_allclose(marginalized[:, 0], (tpm[:, 0] + tpm[:, 2]) / 2)
+        np.testing.assert_allclose(marginalized[:, 1], (tpm[:, 1] + tpm[:, 3]) / 2)
+
+    def test_keeps_distributions(self):
+        tpm = random_tpm(4, 3, seed=5)
+        marginalized = marginalize(tpm, tensors=4, positions=[1, 2, 3], axis=1)
+
+        np.testing.assert_allclose(marginalized[:, 0::2] + marginalized[:, 1::2], 1.0)
+
+    def test_subsystem_distribution(self):
+        tpm = random_tpm(3, 3, seed=6)
+        subsystem = get_subsystem_distribution(tpm, axis=1, effect=(2, 0), cause=(1,))
+
+        self.assertEqual(subsystem.shape, (2, 4))
+        np.testing.assert_allclose(subsystem[:, 0:2], marginalize(tpm[:, [4, 5]], tensors=3, positions=[0, 2], axis=1))
+        np.testing.assert_allclose(subsystem[:, 2:4], marginalize(tpm[:, [0, 1]], tensors=3, positions=[0, 2], axis=1))
+
+if __name__ == '__main__':
+    unittest.main()
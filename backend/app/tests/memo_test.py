@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from app.services.memo import Memo
+
+class TestMemo(unittest.TestCase):
+    def test_canonical_keys(self):
+        memo = Memo()
+        memo.add((0, 1), (2, 0), np.ones(4))
+
+        self.assertIsNotNone(memo.get((0, 1), (0, 2)))
+        self.assertIsNone(memo.get((1, 0), (0, 2)))
+        self.assertIsNone(memo.get((0, 1), (0, 2), scope="MG"))
+
+    def test_counters(self):
+        memo = Memo()
+        memo.add((0,), (0,), np.ones(2))
+        memo.add((0,), (0,), np.ones(2))
+        memo.get((0,), (0,))
+        memo.get((1,), (0,))
+        stats = memo.stats()
+
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["bytes"], 16)
+
+    def test_memory_cap(self):
+        memo = Memo(max_bytes=3 * 16)
+        for e in range(4):
+            memo.add((e,), (0,), np.ones(2))
+
+        self.assertEqual(len(memo), 3)
+        self.assertEqual(memo.stats()["evictions"], 1)
+        self.assertIsNone(memo.get((0,), (0,)))
+
+    def test_invalidate(self):
+        memo = Memo()
+        memo.add((0, 1), (0,), np.ones(4))
+        memo.add((1,), (0,), np.ones(2), scope="MG")
+        memo.add((2,), (0,), np.ones(2))
+        memo.invalidate(1)
+
+        self.assertEqual(len(memo), 1)
+        self.assertEqual(memo.stats()["bytes"], 16)
+
+if __name__ == '__main__':
+    unittest.main()
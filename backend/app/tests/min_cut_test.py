@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from app.services.min_cut import cut_cost, cut_weights, spectral_cut, stoer_wagner
+
+def brute_force_cut(weights: np.ndarray) -> float:
+    n = len(weights)
+    sides = (np.array([(mask >> i) & 1 for i in range(n)], dtype=bool) for mask in range(1, 2**n - 1))
+
+    return min(cut_cost(weights, side) for side in sides)
+
+class TestMinCut(unittest.TestCase):
+    def test_cut_weights(self):
+        weights = cut_weights(np.array([[1.0, 2.0, 3.0]]))
+
+        self.assertEqual(weights.shape, (4, 4))
+        np.testing.assert_array_equal(weights, weights.T)
+        self.assertEqual(cut_cost(weights, np.array([True, False, False, False])), 6.0)
+
+    def test_stoer_wagner_is_exact(self):
+        rng = np.random.default_rng(0)
+        for _ in range(40):
+            shape = (rng.integers(1, 5), rng.integers(2, 5))
+            weights = cut_weights(rng.random(shape) * (rng.random(shape) > 0.3))
+
+            cost, side = stoer_wagner(weights)
+
+            self.assertAlmostEqual(cost, brute_force_cut(weights))
+            self.assertAlmostEqual(cut_cost(weights, side), cost)
+            self.assertTrue(0 < side.sum() < len(side))
+
+    def test_spectral_cut_is_a_valid_cut(self):
+        rng = np.random.default_rng(1)
+        for _ in range(40):
+            weights = cut_weights(rng.random((rng.integers(1, 5), rng.integers(2, 5))))
+            cost, side = spectral_cut(weights)
+
+            self.assertAlmostEqual(cut_cost(weights, side), cost)
+            self.assertGreaterEqual(cost, brute_force_cut(weights) - 1e-9)
+            self.assertTrue(0 < side.sum() < len(side))
+
+    def test_spectral_cut_finds_weak_link(self):
+        costs = np.array([
+            [5.0, 4.0, 0.0, 0.0],
+            [3.0, 6.0, 0.1, 0.0],
+            [0.0, 0.0, 5.0, 4.0],
+            [0.0, 0.2, 3.0, 6.0],
+        ])
+        cost, side = spectral_cut(cut_weights(costs))
+
+        self.assertAlmostEqual(cost, 0.3)
+        self.assertEqual(sorted(np.flatnonzero(side if side[0] else ~side).tolist()), [0, 1, 4, 5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from itertools import product
+from app.services.partitions_generator import gen_gray_partitions, count_gray_positions, count_gray_partitions
+
+class TestGrayPartitions(unittest.TestCase):
+    def bipartition(self, partition):
+        return frozenset([(partition[0], partition[1]), (partition[2], partition[3])])
+
+    def all_bipartitions(self, m):
+        # Both sides need effects and causes, except a side with a single effect and no cause
+        bipartitions = set()
+        for sides in product([0, 1], repeat=len(m[0]) + len(m[1])):
+            a = tuple(e for i, e in enumerate(m[0]) if sides[i])
+            b = tuple(c for j, c in enumerate(m[1]) if sides[len(m[0]) + j])
+            negative_a = tuple(e for e in m[0] if e not in a)
+            negative_b = tuple(c for c in m[1] if c not in b)
+
+            if any(len(x) == 0 or (len(y) == 0 and len(x) != 1) for x, y in [(a, b), (negative_a, negative_b)]):
+                continue
+
+            bipartitions.add(self.bipartition([a, b, negative_a, negative_b]))
+
+        return bipartitions
+
+    def test_same_bipartitions(self):
+        m = [(0, 1, 2, 3), (0, 1, 2)]
+        gray = [self.bipartition(p) for p in gen_gray_partitions(m)]
+
+        self.assertEqual(len(gray), len(set(gray)))
+        self.assertEqual(len(gray), count_gray_partitions(m))
+        self.assertEqual(len(gray), 7*6 + 4)
+        self.assertEqual(set(gray), self.all_bipartitions(m))
+
+    def test_single_node_rows(self):
+        self.assertEqual(list(gen_gray_partitions([(0,), (0, 1)])), [])
+        self.assertEqual(count_gray_partitions([(0,), (0, 1)]), 0)
+
+    def test_single_node_moves(self):
+        partitions = list(gen_gray_partitions([(0, 1, 2, 3), (0, 1, 2, 3)]))
+        moves = [len(set(p[0]) ^ set(q[0])) + len(set(p[1]) ^ set(q[1])) for p, q in zip(partitions, partitions[1:])]
+
+        self.assertGreater(moves.count(1), 0.75 * len(moves))
+
+    def test_position_ranges(self):
+        m = [(0, 1, 2), (0, 1, 2, 3)]
+        positions = count_gray_positions(m)
+        shards = [list(gen_gray_partitions(m, start, start + 10)) for start in range(0, positions, 10)]
+
+        self.assertEqual([p for shard in shards for p in shard], list(gen_gray_partitions(m)))
+
+if __name__ == '__main__':
+    unittest.main()
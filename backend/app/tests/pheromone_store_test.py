@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from app.services.pheromone_store import PheromoneStore, similar_distances
+
+class TestPheromoneStore(unittest.TestCase):
+    def test_exact_and_near_matches(self):
+        store = PheromoneStore()
+        distances = np.array([[np.inf, 2.0], [0.0, 3.0]])
+        store.save(("A", "A'"), distances, np.full((2, 2), 0.5))
+
+        pheromone, match = store.load(("A", "A'"), distances)
+        self.assertEqual(match, "exact")
+        self.assertFalse(pheromone.flags.writeable)
+
+        self.assertEqual(store.load(("A", "A'"), distances * 1.05)[1], "near")
+        self.assertEqual(store.load(("A", "A'"), distances * 2), (None, None))
+        self.assertEqual(store.load(("B", "B'"), distances), (None, None))
+
+        stats = store.stats()
+        self.assertEqual((stats["hits"], stats["near_hits"], stats["misses"]), (1, 1, 2))
+
+    def test_similar_distances(self):
+        distances = np.array([[np.inf, 2.0], [0.0, 3.0]])
+
+        self.assertTrue(similar_distances(np.array([[np.inf, 2.1], [0.0, 3.1]]), distances))
+        self.assertFalse(similar_distances(np.array([[np.inf, 2.0], [0.1, 3.0]]), distances))
+        self.assertFalse(similar_distances(np.array([[1.0, 2.0], [0.0, 3.0]]), distances))
+        self.assertFalse(similar_distances(np.zeros((3, 3)), distances))
+
+    def test_near_match_is_most_recent(self):
+        store = PheromoneStore()
+        store.save(("A",), np.full((1, 1), 1.0), np.ones((1, 1)))
+        store.save(("A",), np.full((1, 1), 1.1), np.full((1, 1), 2.0))
+
+        self.assertEqual(store.load(("A",), np.full((1, 1), 1.05))[0][0, 0], 2.0)
+
+    def test_memory_cap(self):
+        store = PheromoneStore(max_bytes=2 * 64)
+        for k in range(3):
+            store.save((str(k),), np.zeros((2, 2)), np.ones((2, 2)))
+
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.stats()["evictions"], 1)
+        self.assertEqual(store.load(("0",), np.zeros((2, 2))), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from app.tests.helpers import random_tpm
+
+try:
+    from fastapi import HTTPException
+    from app.controller.processes import calculate_partition_distances
+except ModuleNotFoundError: # the controller needs the web dependencies
+    HTTPException = None
+
+@unittest.skipIf(HTTPException is None, "fastapi and sqlalchemy are required by the controller")
+class TestBatchPartitionDistances(unittest.TestCase):
+    def calculate(self, states):
+        return calculate_partition_distances(db=None, full_system=random_tpm(3, 2, seed=1).tolist(), states=states, subsystem=None, merged_matrix=False)
+
+    def test_valid_states(self):
+        responses = self.calculate(["010", "111"])
+
+        self.assertEqual([res.binary_distribution for res in responses], ["010", "111"])
+        self.assertEqual(len(self.calculate("all")), 8)
+
+    def test_rejects_states_of_other_length(self):
+        with self.assertRaises(HTTPException) as error:
+            self.calculate(["010", "01"])
+
+        self.assertEqual(error.exception.status_code, 400)
+
+    def test_rejects_non_binary_states(self):
+        with self.assertRaises(HTTPException) as error:
+            self.calculate(["010", "012"])
+
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertIn("012", error.exception.detail)
+
+if __name__ == '__main__':
+    unittest.main()